@@ -1,15 +1,177 @@
-from passlib.context import CryptContext
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import secrets
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from app.config import settings
+from app.exceptions import ServiceUnavailableError
+from app.hashing import hash_password as _hash, verify_and_update as _verify_and_update, warm_up
+from app.metrics import record_bcrypt
+
+logger = logging.getLogger(__name__)
+
+# bcrypt is pure CPU work, so in the container profile it runs in its own
+# process pool instead of the request threadpool. Elsewhere, and wherever
+# the pool can't be started (no /dev/shm for its queues), it runs inline.
+# At most BCRYPT_MAX_PENDING operations may be queued or running at once,
+# in the pool or inline; beyond that callers get a 503 straight away. A
+# pool broken by a dead worker is replaced and the operation retried once.
+_pool = None
+_pool_failed = False
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(max(settings.BCRYPT_MAX_PENDING, 1))
+
+
+def bcrypt_workers() -> int:
+    """Pool size: BCRYPT_WORKERS, or by default 2 in containers and 0 elsewhere."""
+    if settings.BCRYPT_WORKERS is not None:
+        return settings.BCRYPT_WORKERS
+    return 2 if settings.DB_POOL_PROFILE == "container" else 0
+
+
+def _get_pool():
+    """The process pool, or ``None`` when hashing runs inline."""
+    global _pool, _pool_failed
+    if _pool is None and not _pool_failed and bcrypt_workers() > 0:
+        with _pool_lock:
+            if _pool is None and not _pool_failed:
+                try:
+                    _pool = ProcessPoolExecutor(
+                        max_workers=bcrypt_workers(),
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                except (OSError, ImportError, NotImplementedError):
+                    logger.warning("Could not start the bcrypt process pool; hashing inline", exc_info=True)
+                    _pool_failed = True
+    return _pool
+
+
+def start_pool():
+    """Spawn the pool's workers now rather than on the first request."""
+    pool = _get_pool()
+    if pool is not None:
+        workers = bcrypt_workers()
+        for future in [pool.submit(warm_up, settings.BCRYPT_ROUNDS) for _ in range(workers)]:
+            future.result()
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+
+def _discard_pool(pool):
+    # A worker died (e.g. OOM-killed), which breaks the whole executor; drop
+    # it so the next call starts a fresh one.
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _acquire_slot():
+    if not _slots.acquire(blocking=False):
+        raise ServiceUnavailableError(
+            detail="Server busy, please retry",
+            headers={"Retry-After": "1"},
+        )
+
+
+def _submit(pool, fn, *args):
+    """Submit to ``pool``, holding a slot until the work is done."""
+    _acquire_slot()
+    try:
+        try:
+            future = pool.submit(fn, *args)
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            pool = _get_pool()
+            if pool is None:
+                raise
+            future = pool.submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+
+    def done(future):
+        _slots.release()
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            _discard_pool(pool)
+
+    future.add_done_callback(done)
+    return future
+
+
+def _run_inline(fn, *args):
+    _acquire_slot()
+    try:
+        return fn(*args)
+    finally:
+        _slots.release()
+
+
+def _run(operation, fn, *args):
+    start = time.perf_counter()
+    try:
+        pool = _get_pool()
+        if pool is None:
+            return _run_inline(fn, *args)
+        try:
+            return _submit(pool, fn, *args).result()
+        except BrokenProcessPool:
+            # Retry once on the fresh pool that replaces the broken one.
+            pool = _get_pool()
+            if pool is None:
+                return _run_inline(fn, *args)
+            return _submit(pool, fn, *args).result()
+    finally:
+        record_bcrypt(operation, time.perf_counter() - start)
+
+
+async def _run_async(operation, fn, *args):
+    start = time.perf_counter()
+    try:
+        pool = _get_pool()
+        if pool is None:
+            return await asyncio.to_thread(_run_inline, fn, *args)
+        try:
+            return await asyncio.wrap_future(_submit(pool, fn, *args))
+        except BrokenProcessPool:
+            pool = _get_pool()
+            if pool is None:
+                return await asyncio.to_thread(_run_inline, fn, *args)
+            return await asyncio.wrap_future(_submit(pool, fn, *args))
+    finally:
+        record_bcrypt(operation, time.perf_counter() - start)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return _run("hash", _hash, password, settings.BCRYPT_ROUNDS)
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return verify_and_update_password(plain_password, hashed_password)[0]
+
+def verify_and_update_password(plain_password, hashed_password):
+    """Return ``(valid, new_hash)``; ``new_hash`` is set when BCRYPT_ROUNDS changed."""
+    return _run("verify_and_update", _verify_and_update, plain_password, hashed_password, settings.BCRYPT_ROUNDS)
+
+async def hash_password_async(password):
+    return await _run_async("hash", _hash, password, settings.BCRYPT_ROUNDS)
+
+async def verify_and_update_password_async(plain_password, hashed_password):
+    return await _run_async("verify_and_update", _verify_and_update, plain_password, hashed_password, settings.BCRYPT_ROUNDS)
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
@@ -18,9 +180,31 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
+    to_encode.setdefault("jti", uuid.uuid4().hex)
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+def new_refresh_token():
+    """Return ``(token_id, token, token_hash)`` for a fresh refresh token.
+
+    The token is ``<id>.<secret>``; only the SHA-256 of the secret is stored.
+    The secret is random, so a fast hash is enough and checking a token
+    costs no bcrypt work.
+    """
+    token_id = str(uuid.uuid4())
+    secret = secrets.token_urlsafe(32)
+    return token_id, f"{token_id}.{secret}", refresh_token_hash(secret)
+
+def refresh_token_hash(secret: str) -> bytes:
+    return hashlib.sha256(secret.encode()).digest()
+
+def parse_refresh_token(token: str):
+    """Split a refresh token into ``(token_id, secret)``, or ``(None, None)``."""
+    token_id, _, secret = token.partition(".")
+    if not token_id or not secret:
+        return None, None
+    return token_id, secret
+
 def current_user(token: str, expires_delta: timedelta = None):
     payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
     print(payload)
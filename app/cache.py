@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app import models
+from app.config import settings
+from app.db import RoutingSession, session_principal
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a deadline."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+class MembershipIndex(TTLCache):
+    """userId -> set of the orgIds that user belongs to.
+
+    Entries are whole sets loaded per user (see ``crud.get_memberships``).
+    ``add`` only extends a set that is already cached, so a partial set is
+    never mistaken for a complete one.
+    """
+
+    def add(self, userId, orgId):
+        with self._lock:
+            entry = self._data.get(userId)
+            if entry is not None:
+                entry[0].add(orgId)
+
+
+# Authenticated principals keyed by the token's ``sub`` claim. Entries never
+# outlive the token that populated them (see ``get_current_user``).
+principal_cache = TTLCache(settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL_SECONDS)
+
+# Read-through caches of the public fields of users and organisations, keyed
+# by primary key (see ``crud.get_user`` and ``crud.get_organisation``).
+user_cache = TTLCache(settings.ENTITY_CACHE_SIZE, settings.ENTITY_CACHE_TTL_SECONDS)
+organisation_cache = TTLCache(settings.ENTITY_CACHE_SIZE, settings.ENTITY_CACHE_TTL_SECONDS)
+
+# Membership checks for the org-scoped endpoints (see ``crud.is_member``).
+membership_index = MembershipIndex(settings.MEMBERSHIP_CACHE_SIZE, settings.MEMBERSHIP_CACHE_TTL_SECONDS)
+# userIds whose set was loaded within the last refresh interval, so repeated
+# misses (probing, or a burst of requests for an org the user just left)
+# don't each go to the database.
+membership_refreshes = TTLCache(settings.MEMBERSHIP_CACHE_SIZE, settings.MEMBERSHIP_REFRESH_INTERVAL_SECONDS)
+
+
+# Updated and deleted rows are evicted once the transaction commits. Evicting
+# at flush time would let a concurrent read of the old row, between flush
+# and commit, put it straight back for a whole TTL.
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_user(mapper, connection, target):
+    _stale(target).append((principal_cache, target.userId))
+    _stale(target).append((user_cache, target.userId))
+
+
+@event.listens_for(models.Organisation, "after_update")
+@event.listens_for(models.Organisation, "after_delete")
+def _invalidate_organisation(mapper, connection, target):
+    _stale(target).append((organisation_cache, target.orgId))
+
+
+def _stale(target):
+    return object_session(target).info.setdefault("stale_cache_keys", [])
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_stale(session):
+    for cache, key in session.info.pop("stale_cache_keys", ()):
+        cache.invalidate(key)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_stale(session):
+    session.info.pop("stale_cache_keys", None)
+
+
+# Principals that committed a write recently; their reads skip the replicas
+# until replication has had time to catch up (see ``db.RoutingSession``).
+primary_sticky = TTLCache(settings.PRINCIPAL_CACHE_SIZE, settings.DB_REPLICA_STICKY_SECONDS)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _flushed(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _executed(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _committed(session):
+    principal = session_principal(session)
+    if session.info.pop("wrote", False) and principal is not None:
+        primary_sticky.set(principal, True)
+    # Memberships recorded by crud are only indexed once they are durable.
+    for userId, orgId in session.info.pop("new_memberships", ()):
+        membership_index.add(userId, orgId)
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _rolled_back(session):
+    session.info.pop("wrote", None)
+    session.info.pop("new_memberships", None)
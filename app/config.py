@@ -1,12 +1,58 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
-    DB_USER: str
-    DB_HOST: str
-    DB_PWD: str
+    # Either a full SQLAlchemy URL (e.g. sqlite:///./hng.db for local runs) or
+    # the DB_* parts of the hosted Postgres instance.
+    DATABASE_URL: Optional[str] = None
+    DB_USER: Optional[str] = None
+    DB_HOST: Optional[str] = None
+    DB_PWD: Optional[str] = None
+    DB_SSLMODE: Optional[str] = "require"
+    # "container" keeps a warm QueuePool per process; "serverless" opens a
+    # connection per checkout (NullPool); "external" is NullPool behind a
+    # transaction-mode pooler such as PgBouncer.
+    DB_POOL_PROFILE: str = "container"
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Comma-separated URLs of read replicas. Read-only sessions (see
+    # ``get_read_db``) use one of them; a principal that just wrote reads
+    # from the primary for DB_REPLICA_STICKY_SECONDS.
+    DB_REPLICA_URLS: Optional[str] = None
+    DB_REPLICA_STICKY_SECONDS: int = 5
+    # Compare the database's migration revision with the code's at startup
+    # (container profile only).
+    DB_STARTUP_CHECK: bool = True
+    # Key generator for new rows: "uuid4" (random) or "uuid7" (time-ordered,
+    # so inserts append to the end of the primary-key index).
+    ID_STRATEGY: str = "uuid4"
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 14
+    REVOCATION_SYNC_SECONDS: int = 30
+    BCRYPT_ROUNDS: int = 12
+    # bcrypt process pool size; unset means 2 in the container profile and
+    # 0 (inline) elsewhere.
+    BCRYPT_WORKERS: Optional[int] = None
+    BCRYPT_MAX_PENDING: int = 32
+    # Log statements slower than this many milliseconds (unset: disabled).
+    SLOW_QUERY_MS: Optional[float] = None
+    SLOW_QUERY_EXPLAIN: bool = True
+    SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS: int = 300
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    ENTITY_CACHE_SIZE: int = 10000
+    ENTITY_CACHE_TTL_SECONDS: int = 300
+    MEMBERSHIP_CACHE_SIZE: int = 10000
+    MEMBERSHIP_CACHE_TTL_SECONDS: int = 300
+    # A failed membership check reloads the user's set from the database at
+    # most once per this many seconds.
+    MEMBERSHIP_REFRESH_INTERVAL_SECONDS: float = 5
 
     class Config:
         env_file = ".env"
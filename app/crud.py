@@ -1,45 +1,517 @@
-from sqlalchemy.orm import Session
+import importlib
+from contextlib import asynccontextmanager
+
+from sqlalchemy import delete, exists, func, insert, literal, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from app import models, schemas
-from app.auth import get_password_hash
+from app.auth import hash_password_async, new_refresh_token, parse_refresh_token, refresh_token_hash
+from app.cache import membership_index, membership_refreshes, organisation_cache, user_cache
+import base64
+import hmac
+import json
+import os
+import time
 import uuid
+from datetime import datetime, timedelta
+from app.config import settings
+
+
+def uuid7() -> uuid.UUID:
+    """Time-ordered UUID (RFC 9562 version 7).
+
+    48 bits of Unix time in milliseconds, then 74 random bits. IDs from
+    different milliseconds sort by creation time, so new keys land at the
+    right-hand edge of the index instead of at a random page.
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    # Version 7 in bits 76-79, RFC 4122 variant in bits 62-63.
+    value = (value & ~(0xF << 76)) | (0x7 << 76)
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)
+    return uuid.UUID(int=value)
+
+
+ID_GENERATORS = {
+    "uuid4": uuid.uuid4,
+    "uuid7": uuid7,
+}
+if settings.ID_STRATEGY not in ID_GENERATORS:
+    raise ValueError(f"Unknown ID_STRATEGY {settings.ID_STRATEGY!r}, expected one of {tuple(ID_GENERATORS)}")
+_generate_id = ID_GENERATORS[settings.ID_STRATEGY]
+
+
+def new_id() -> str:
+    """New primary key for users, organisations and memberships."""
+    return str(_generate_id())
+
 
+def _insert(db: AsyncSession, model):
+    """Dialect-specific INSERT supporting ``on_conflict_do_nothing``.
 
-def create_user(db: Session, user: schemas.UserCreate):
+    Only the postgresql and sqlite dialects provide it; the dialect module is
+    imported on first use.
+    """
+    dialect = importlib.import_module(f"sqlalchemy.dialects.{db.get_bind().dialect.name}")
+    return dialect.insert(model)
+
+
+@asynccontextmanager
+async def unit_of_work(db: AsyncSession):
+    """Commit everything added inside the block in a single transaction.
+
+    Pass ``commit=False`` to the create_* helpers used inside the block; the
+    inserts are flushed together on exit and rolled back if anything fails.
+    """
+    try:
+        yield db
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
+
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate, commit: bool = True):
     db_user = models.User(
-        userId=str(uuid.uuid4()),
+        userId=new_id(),
         firstName=user.firstName,
         lastName=user.lastName,
         email=user.email,
-        hashed_password=get_password_hash(user.password),
+        hashed_password=await hash_password_async(user.password),
         phone=user.phone,
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    if commit:
+        await db.commit()
     return db_user
 
-def create_organisation(db: Session, organisation: schemas.OrganisationCreate, userId: str):
+async def create_organisation(db: AsyncSession, organisation: schemas.OrganisationCreate, userId: str, commit: bool = True, unique_name: bool = False):
+    """Create an organisation.
+
+    With ``unique_name`` the row is written by a single conditional INSERT
+    that skips names already in use; ``None`` is returned in that case. A
+    concurrent create of the same name that slips past the check raises
+    ``IntegrityError`` from the unique index on ``unique_name``.
+    """
     db_org = models.Organisation(
-        orgId=str(uuid.uuid4()),
+        orgId=new_id(),
         name=organisation.name,
         description=organisation.description,
         creator_id=userId
     )
-    db.add(db_org)
-    db.commit()
-    db.refresh(db_org)
+    if unique_name:
+        table = models.Organisation.__table__
+        values = {
+            "orgId": db_org.orgId,
+            "name": db_org.name,
+            "description": db_org.description,
+            "creator_id": db_org.creator_id,
+            "unique_name": db_org.name,
+        }
+        stmt = insert(table).from_select(
+            list(values),
+            select(*[literal(value, table.c[key].type) for key, value in values.items()])
+            .where(~exists().where(table.c.name == organisation.name)),
+        )
+        result = await db.execute(stmt)
+        if result.rowcount == 0:
+            return None
+    else:
+        db.add(db_org)
+    if commit:
+        await db.commit()
     return db_org
 
-def create_user_orgs(db: Session, data: schemas.UserOrgsCreate):
+def org_name_key(orgId):
+    """``users_organisation.name_key`` for a membership of ``orgId``.
+
+    A scalar subquery, so the key is computed by the same lower() the
+    search compares with, without a round trip. An organisation inserted
+    earlier in the same flush is visible to it.
+    """
+    return (
+        select(func.lower(models.Organisation.name))
+        .where(models.Organisation.orgId == orgId)
+        .scalar_subquery()
+    )
+
+def _record_memberships(db: AsyncSession, orgId: str, userIds):
+    # Applied to ``membership_index`` when the transaction commits.
+    db.info.setdefault("new_memberships", []).extend((userId, orgId) for userId in userIds)
+
+async def _increment_member_count(db: AsyncSession, orgId: str, by: int = 1):
+    # An organisation created in this unit of work is still pending, so its
+    # counter is bumped in memory and written with the INSERT.
+    for obj in db.new:
+        if isinstance(obj, models.Organisation) and obj.orgId == orgId:
+            obj.member_count = (obj.member_count or 0) + by
+            return
+    await db.execute(
+        update(models.Organisation)
+        .where(models.Organisation.orgId == orgId)
+        .values(member_count=models.Organisation.member_count + by)
+        .execution_options(synchronize_session=False)
+    )
+
+async def create_user_orgs(db: AsyncSession, data: schemas.UserOrgsCreate, commit: bool = True):
     db_org = models.User_organisation(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         userId=data.userId,
         orgId=data.orgId,
+        name_key=org_name_key(data.orgId),
     )
     db.add(db_org)
-    db.commit()
-    db.refresh(db_org)
+    await _increment_member_count(db, data.orgId)
+    _record_memberships(db, data.orgId, [data.userId])
+    if commit:
+        await db.commit()
     return db_org
 
-def get_user_by_email(db: Session, email: str):
-    return db.query(models.User).filter(models.User.email == email).first()
+async def create_user_orgs_if_absent(db: AsyncSession, data: schemas.UserOrgsCreate, commit: bool = True):
+    """Insert a membership unless it already exists; return whether it was added.
+
+    Relies on the unique (userId, orgId) index instead of a lookup. Unknown
+    users or organisations surface as an IntegrityError.
+    """
+    stmt = _insert(db, models.User_organisation).values(
+        id=new_id(),
+        userId=data.userId,
+        orgId=data.orgId,
+        name_key=org_name_key(data.orgId),
+    ).on_conflict_do_nothing(index_elements=["userId", "orgId"])
+    result = await db.execute(stmt)
+    added = result.rowcount == 1
+    if added:
+        await _increment_member_count(db, data.orgId)
+        _record_memberships(db, data.orgId, [data.userId])
+    if commit:
+        await db.commit()
+    return added
+
+BULK_CHUNK_SIZE = 500
+
+
+def _chunks(items, size=BULK_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def create_user_orgs_bulk(db: AsyncSession, orgId: str, userIds: list, commit: bool = True):
+    """Add many users to an organisation with set-based queries.
+
+    Returns ``[(userId, outcome), ...]`` in request order, or ``None`` if the
+    organisation does not exist. Outcomes are "added", "already_member",
+    "not_found", or "duplicate" for a repeated id after its first occurrence.
+    Lookups run in chunks. Inserts are multi-row INSERT ... ON CONFLICT DO
+    NOTHING RETURNING, so a concurrent add of the same member is reported
+    as already_member rather than double-counted.
+    """
+    if await db.get(models.Organisation, orgId) is None:
+        return None
+    unique_ids = list(dict.fromkeys(userIds))
+
+    known, members = set(), set()
+    for chunk in _chunks(unique_ids):
+        known.update((await db.execute(select(models.User.userId).where(models.User.userId.in_(chunk)))).scalars())
+        members.update((await db.execute(
+            select(models.User_organisation.userId)
+            .where(models.User_organisation.orgId == orgId, models.User_organisation.userId.in_(chunk))
+        )).scalars())
+
+    candidates = [userId for userId in unique_ids if userId in known and userId not in members]
+    added = set()
+    for chunk in _chunks(candidates):
+        stmt = (
+            _insert(db, models.User_organisation)
+            .values([{"id": new_id(), "userId": userId, "orgId": orgId, "name_key": org_name_key(orgId)} for userId in chunk])
+            .on_conflict_do_nothing(index_elements=["userId", "orgId"])
+            .returning(models.User_organisation.userId)
+        )
+        added.update((await db.execute(stmt)).scalars())
+    if added:
+        await _increment_member_count(db, orgId, len(added))
+        _record_memberships(db, orgId, added)
+    if commit:
+        await db.commit()
+
+    results, seen = [], set()
+    for userId in userIds:
+        if userId in seen:
+            status = "duplicate"
+        elif userId not in known:
+            status = "not_found"
+        elif userId in added:
+            status = "added"
+        else:
+            status = "already_member"
+        seen.add(userId)
+        results.append((userId, status))
+    return results
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    # Matches the case-insensitive uq_users_email_lower index.
+    result = await db.execute(select(models.User).where(func.lower(models.User.email) == email.lower()))
+    return result.scalars().first()
+
+async def get_user_organisations(db: AsyncSession, userId: str, limit: int, cursor: str = None):
+    # Keyset pagination on orgId: the cursor is the last orgId of the previous page.
+    query = (
+        select(models.Organisation)
+        .join(models.User_organisation, models.User_organisation.orgId == models.Organisation.orgId)
+        .where(models.User_organisation.userId == userId)
+    )
+    if cursor is not None:
+        query = query.where(models.Organisation.orgId > cursor)
+    result = await db.execute(query.order_by(models.Organisation.orgId).limit(limit))
+    return result.scalars().all()
+
+MEMBER_COLUMNS = (
+    models.User.userId,
+    models.User.firstName,
+    models.User.lastName,
+    models.User.email,
+    models.User.phone,
+)
+
+
+def _organisation_members(orgId: str):
+    # Walks ix_users_organisation_org_user in userId order.
+    return (
+        select(*MEMBER_COLUMNS)
+        .join(models.User_organisation, models.User_organisation.userId == models.User.userId)
+        .where(models.User_organisation.orgId == orgId)
+        .order_by(models.User_organisation.userId)
+    )
+
+def _name_key(db: AsyncSession):
+    # Same expression as ix_users_organisation_user_name.
+    key = models.User_organisation.name_key
+    if db.get_bind().dialect.name == "postgresql":
+        key = key.collate("C")
+    return key
+
+def encode_search_cursor(name_key: str, orgId: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([name_key, orgId]).encode()).decode()
+
+def decode_search_cursor(cursor: str):
+    """``(name_key, orgId)`` from a search cursor, or ``None`` if it is malformed."""
+    try:
+        name_key, orgId = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(name_key, str) or not isinstance(orgId, str):
+        return None
+    return name_key, orgId
+
+async def search_organisations(db: AsyncSession, userId: str, q: str, limit: int, cursor: tuple = None):
+    """Organisations ``userId`` belongs to whose name starts with ``q``, case-insensitively.
+
+    A range scan of the caller's rows in ix_users_organisation_user_name:
+    name_key >= q and below the next prefix, so LIKE wildcards in ``q``
+    mean nothing, and the cost follows the caller's memberships rather
+    than the whole table. Results are ordered by (name_key, orgId);
+    ``cursor`` is the last pair of the previous page. Returns
+    ``(organisation dicts, name keys)``. SQLite's lower() only folds ASCII
+    letters.
+    """
+    prefix = q.lower()
+    key = _name_key(db)
+    member = models.User_organisation
+    query = (
+        select(models.Organisation.orgId, models.Organisation.name, models.Organisation.description, key.label("name_key"))
+        .select_from(member)
+        .join(models.Organisation, models.Organisation.orgId == member.orgId)
+        .where(member.userId == userId, key >= prefix)
+    )
+    if ord(prefix[-1]) < 0x10FFFF:
+        # The smallest string greater than every string starting with prefix.
+        query = query.where(key < prefix[:-1] + chr(ord(prefix[-1]) + 1))
+    if cursor is not None:
+        query = query.where(tuple_(key, member.orgId) > tuple_(literal(cursor[0]), literal(cursor[1], models.UUIDKey())))
+    result = await db.execute(query.order_by(key, member.orgId).limit(limit))
+    rows = result.all()
+    return (
+        [{"orgId": row.orgId, "name": row.name, "description": row.description} for row in rows],
+        [row.name_key for row in rows],
+    )
+
+async def get_memberships(db: AsyncSession, userId: str, refresh: bool = False):
+    """The set of orgIds ``userId`` belongs to, from ``membership_index``.
+
+    ``refresh`` reloads it from the database, unless it was loaded within
+    the last MEMBERSHIP_REFRESH_INTERVAL_SECONDS.
+    """
+    orgIds = membership_index.get(userId)
+    if refresh and membership_refreshes.get(userId) is None:
+        orgIds = None
+    if orgIds is None:
+        result = await db.execute(
+            select(models.User_organisation.orgId).where(models.User_organisation.userId == userId)
+        )
+        orgIds = set(result.scalars())
+        membership_index.set(userId, orgIds)
+        membership_refreshes.set(userId, True)
+    return orgIds
+
+async def is_member(db: AsyncSession, userId: str, orgId: str):
+    """Whether ``userId`` belongs to ``orgId``.
+
+    Answered from ``membership_index``; a miss on a cached set is checked
+    against the database again, since another process may have added it,
+    at most once per refresh interval.
+    """
+    orgIds = await get_memberships(db, userId)
+    if orgId not in orgIds:
+        orgIds = await get_memberships(db, userId, refresh=True)
+    return orgId in orgIds
+
+async def get_organisation_members(db: AsyncSession, orgId: str, limit: int, cursor: str = None):
+    # Keyset pagination on userId: the cursor is the last userId of the previous page.
+    query = _organisation_members(orgId)
+    if cursor is not None:
+        query = query.where(models.User_organisation.userId > cursor)
+    result = await db.execute(query.limit(limit))
+    return [dict(row) for row in result.mappings()]
+
+async def stream_organisation_members(db: AsyncSession, orgId: str, batch_size: int = 1000):
+    """Yield an organisation's members as lists of dicts, ``batch_size`` at a time.
+
+    Rows come from a server-side cursor, so memory use does not grow with
+    the size of the organisation.
+    """
+    result = await db.stream(_organisation_members(orgId).execution_options(yield_per=batch_size))
+    async for partition in result.mappings().partitions():
+        yield [dict(row) for row in partition]
+
+async def get_member_counts(db: AsyncSession, orgIds: list):
+    """``{orgId: member_count}`` for the organisations that exist, in one query."""
+    result = await db.execute(
+        select(models.Organisation.orgId, models.Organisation.member_count)
+        .where(models.Organisation.orgId.in_(orgIds))
+    )
+    return dict(result.all())
+
+async def reconcile_member_counts(db: AsyncSession, commit: bool = True):
+    """Repair drifted ``member_count`` values with one set-based UPDATE.
+
+    Only rows whose counter disagrees with the membership table are
+    written. Returns the number of organisations repaired.
+    """
+    actual = (
+        select(func.count())
+        .where(models.User_organisation.orgId == models.Organisation.orgId)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        update(models.Organisation)
+        .where(models.Organisation.member_count != actual)
+        .values(member_count=actual)
+        .execution_options(synchronize_session=False)
+    )
+    if commit:
+        await db.commit()
+    return result.rowcount
+
+async def get_user(db: AsyncSession, userId: str):
+    """Public fields of a user as a dict, served from ``user_cache`` when possible."""
+    data = user_cache.get(userId)
+    if data is None:
+        user = await db.get(models.User, userId)
+        if user is None:
+            return None
+        data = {
+            "userId": user.userId,
+            "firstName": user.firstName,
+            "lastName": user.lastName,
+            "email": user.email,
+            "phone": user.phone,
+        }
+        user_cache.set(userId, data)
+    return data
+
+async def get_organisation(db: AsyncSession, orgId: str):
+    """Public fields of an organisation as a dict, served from ``organisation_cache`` when possible."""
+    data = organisation_cache.get(orgId)
+    if data is None:
+        organisation = await db.get(models.Organisation, orgId)
+        if organisation is None:
+            return None
+        data = {
+            "orgId": organisation.orgId,
+            "name": organisation.name,
+            "description": organisation.description,
+        }
+        organisation_cache.set(orgId, data)
+    return data
+
+async def create_refresh_token(db: AsyncSession, userId: str, family_id: str = None, commit: bool = True):
+    """Issue a refresh token for ``userId`` and return it.
+
+    A new family is started unless ``family_id`` continues a rotation chain.
+    """
+    token_id, token, token_hash = new_refresh_token()
+    db.add(models.RefreshToken(
+        id=token_id,
+        family_id=family_id or token_id,
+        userId=userId,
+        token_hash=token_hash,
+        expires_at=datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    if commit:
+        await db.commit()
+    return token
+
+async def rotate_refresh_token(db: AsyncSession, token: str):
+    """Exchange a refresh token for a successor; return ``(userId, new_token)``.
+
+    Returns ``None`` for unknown, expired or tampered tokens. A token that was
+    already used means it leaked, so its whole family is revoked and ``None``
+    returned.
+    """
+    token_id, secret = parse_refresh_token(token)
+    if token_id is None:
+        return None
+    row = await db.get(models.RefreshToken, token_id)
+    if row is None or not hmac.compare_digest(row.token_hash, refresh_token_hash(secret)):
+        return None
+    now = datetime.utcnow()
+    if row.expires_at <= now:
+        return None
+    # Conditional update: of two concurrent uses only one can mark it used.
+    claimed = await db.execute(
+        update(models.RefreshToken)
+        .where(models.RefreshToken.id == token_id, models.RefreshToken.used_at.is_(None))
+        .values(used_at=now)
+    )
+    if claimed.rowcount == 0:
+        await revoke_refresh_token_family(db, row.family_id)
+        return None
+    new_token = await create_refresh_token(db, row.userId, family_id=row.family_id, commit=False)
+    await db.commit()
+    return row.userId, new_token
+
+async def revoke_refresh_token(db: AsyncSession, token: str, commit: bool = True):
+    """Revoke the family of a valid refresh token; return whether it was valid."""
+    token_id, secret = parse_refresh_token(token)
+    row = await db.get(models.RefreshToken, token_id) if token_id is not None else None
+    if row is None or not hmac.compare_digest(row.token_hash, refresh_token_hash(secret)):
+        return False
+    await revoke_refresh_token_family(db, row.family_id, commit=commit)
+    return True
+
+async def revoke_refresh_token_family(db: AsyncSession, family_id: str, commit: bool = True):
+    await db.execute(delete(models.RefreshToken).where(models.RefreshToken.family_id == family_id))
+    if commit:
+        await db.commit()
+
+async def purge_expired_refresh_tokens(db: AsyncSession, commit: bool = True):
+    """Drop expired tokens; used ones are kept until then for reuse detection."""
+    result = await db.execute(delete(models.RefreshToken).where(models.RefreshToken.expires_at <= datetime.utcnow()))
+    if commit:
+        await db.commit()
+    return result.rowcount
+
+async def purge_expired_revoked_tokens(db: AsyncSession, commit: bool = True):
+    """Drop denylist rows for tokens that would have expired anyway."""
+    result = await db.execute(delete(models.RevokedToken).where(models.RevokedToken.expires_at <= datetime.utcnow()))
+    if commit:
+        await db.commit()
+    return result.rowcount
@@ -1,12 +1,261 @@
-from sqlalchemy import create_engine
+import random
+import threading
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+from sqlalchemy.sql.dml import UpdateBase
 from app.config import settings
 
 
-SQLALCHEMY_DATABASE_URL = f"postgresql://{settings.DB_USER}:{settings.DB_PWD}@{settings.DB_HOST}/Hng?sslmode=require"
+if settings.DATABASE_URL:
+    SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
+else:
+    SQLALCHEMY_DATABASE_URL = f"postgresql://{settings.DB_USER}:{settings.DB_PWD}@{settings.DB_HOST}/Hng"
+    if settings.DB_SSLMODE:
+        SQLALCHEMY_DATABASE_URL += f"?sslmode={settings.DB_SSLMODE}"
+
+POOL_PROFILES = ("container", "serverless", "external")
+
+# Async drivers used by the request path for each sync backend.
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str):
+    """Return ``(url, connect_args)`` for the async counterpart of a sync URL."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    url = url.set(drivername=ASYNC_DRIVERS.get(backend, url.drivername))
+    connect_args = {}
+    if backend == "postgresql" and "sslmode" in url.query:
+        # asyncpg takes the libpq sslmode as its ``ssl`` argument.
+        connect_args["ssl"] = url.query["sslmode"]
+        url = url.difference_update_query(["sslmode"])
+    return url, connect_args
+
+
+class _TimedPoolMixin:
+    """Records how long callers wait to check a connection out of the pool."""
+
+    wait_count = 0
+    wait_seconds_total = 0.0
+    wait_seconds_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            self.wait_count += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(is_async: bool = False):
+    """Keyword arguments for ``create_engine`` according to DB_POOL_PROFILE."""
+    profile = settings.DB_POOL_PROFILE
+    if profile not in POOL_PROFILES:
+        raise ValueError(f"Unknown DB_POOL_PROFILE {profile!r}, expected one of {POOL_PROFILES}")
+    if profile != "container":
+        return {"poolclass": NullPool, "pool_pre_ping": settings.DB_POOL_PRE_PING}
+    return {
+        "poolclass": TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    stats = {"profile": settings.DB_POOL_PROFILE, "pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checkedIn": pool.checkedin(),
+            "checkedOut": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "maxOverflow": pool._max_overflow,
+        })
+    if isinstance(pool, _TimedPoolMixin):
+        stats.update({
+            "waitCount": pool.wait_count,
+            "waitSecondsTotal": pool.wait_seconds_total,
+            "waitSecondsMax": pool.wait_seconds_max,
+        })
+    return stats
+
+
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def _configure_engine(engine):
+    # SQLite only enforces foreign keys when asked to, per connection.
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _enable_sqlite_foreign_keys)
+    return engine
+
+
+def session_principal(session):
+    """userId of the authenticated caller whose request owns ``session``, if any."""
+    return getattr(session.info.get("state"), "principal", None)
+
+
+class RoutingSession(Session):
+    """Session that sends the reads of read-only sessions to a replica.
+
+    A read-only session (``info["read_only"]``) picks one replica for its
+    lifetime and runs its SELECTs there. Flushes and DML always go to the
+    primary. So do reads for a principal that committed a write within the
+    last DB_REPLICA_STICKY_SECONDS (``cache.primary_sticky``), which gives
+    read-your-writes in a single process.
+    """
+
+    def __init__(self, *args, replicas=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replica = random.choice(replicas) if replicas else None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if (
+            self.replica is not None
+            and self.info.get("read_only")
+            and not self._flushing
+            and not isinstance(clause, UpdateBase)
+            and not self._is_sticky()
+        ):
+            return self.replica.sync_engine
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+    def _is_sticky(self):
+        principal = session_principal(self)
+        if principal is None:
+            return False
+        from app.cache import primary_sticky
+        return primary_sticky.get(principal) is not None
+
+
+def routing_sessionmaker(primary, replicas=(), read_only: bool = False):
+    # expire_on_commit=False: attributes of committed objects stay readable
+    # without an implicit (and, under asyncio, illegal) lazy refresh.
+    return async_sessionmaker(
+        bind=primary,
+        class_=AsyncSession,
+        sync_session_class=RoutingSession,
+        replicas=list(replicas) if read_only else [],
+        info={"read_only": read_only},
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+
+# Engines and session factories are built on first use rather than at import,
+# so importing the app (a serverless cold start) doesn't load database
+# drivers or touch the network. They stay reachable under their old module
+# attribute names through ``__getattr__`` below.
+_lazy = {}
+_lazy_lock = threading.RLock()
+
+
+def _build_engine():
+    # The sync engine is kept for schema management, scripts and tests;
+    # request handlers go through the async engine.
+    return _configure_engine(create_engine(SQLALCHEMY_DATABASE_URL, **engine_options()))
+
+
+def _build_async_engine(database_url=SQLALCHEMY_DATABASE_URL):
+    url, connect_args = async_database_url(database_url)
+    if settings.DB_POOL_PROFILE == "external" and url.get_backend_name() == "postgresql":
+        # Transaction-mode poolers can't keep asyncpg's per-connection prepared
+        # statements alive between transactions.
+        connect_args["statement_cache_size"] = 0
+    engine = create_async_engine(url, connect_args=connect_args, **engine_options(is_async=True))
+    _configure_engine(engine.sync_engine)
+    return engine
+
+
+def _build_session_local():
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+
+
+def _build_replica_engines():
+    urls = [url.strip() for url in (settings.DB_REPLICA_URLS or "").split(",") if url.strip()]
+    return [_build_async_engine(url) for url in urls]
+
+
+def _build_async_session_local():
+    return routing_sessionmaker(get_async_engine())
+
+
+def _build_async_read_session_local():
+    return routing_sessionmaker(get_async_engine(), get_replica_engines(), read_only=True)
+
+
+_BUILDERS = {
+    "engine": _build_engine,
+    "async_engine": _build_async_engine,
+    "SessionLocal": _build_session_local,
+    "TestingSessionLocal": _build_session_local,
+    "replica_engines": _build_replica_engines,
+    "AsyncSessionLocal": _build_async_session_local,
+    "AsyncReadSessionLocal": _build_async_read_session_local,
+}
+
+
+def _get(name):
+    value = _lazy.get(name)
+    if value is None:
+        with _lazy_lock:
+            value = _lazy.get(name)
+            if value is None:
+                value = _lazy[name] = _BUILDERS[name]()
+    return value
+
+
+def get_engine():
+    return _get("engine")
+
+
+def get_async_engine():
+    return _get("async_engine")
+
+
+def get_replica_engines():
+    return _get("replica_engines")
+
+
+def get_async_sessionmaker():
+    return _get("AsyncSessionLocal")
+
+
+def get_async_read_sessionmaker():
+    return _get("AsyncReadSessionLocal")
+
+
+def __getattr__(name):
+    if name in _BUILDERS:
+        return _get(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
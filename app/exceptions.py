@@ -2,14 +2,14 @@ from typing import Any, Optional, Dict
 
 from fastapi import status
 from fastapi import HTTPException
-from starlette.responses import JSONResponse
-
-from app.schemas import ErrorSchema
+from fastapi.responses import ORJSONResponse
 
 
 async def http_exception_handler(request, exc):
-    content = ErrorSchema(status='Bad request', message=exc.detail, statusCode=exc.status_code).model_dump(mode='json')
-    return JSONResponse(content, status_code=exc.status_code)
+    # Same shape as schemas.ErrorSchema, built directly to skip model
+    # validation on the error path.
+    content = {"status": "Bad request", "message": exc.detail, "statusCode": exc.status_code}
+    return ORJSONResponse(content, status_code=exc.status_code, headers=exc.headers)
 
 
 class AuthError(HTTPException):
@@ -29,4 +29,11 @@ class NotFoundError(HTTPException):
     def __init__(
         self, detail: Any = None, headers: Optional[Dict[str, Any]] = None
     ) -> None:
-        super().__init__(status.HTTP_404_NOT_FOUND, detail, headers)
\ No newline at end of file
+        super().__init__(status.HTTP_404_NOT_FOUND, detail, headers)
+
+
+class ServiceUnavailableError(HTTPException):
+    def __init__(
+        self, detail: Any = None, headers: Optional[Dict[str, Any]] = None
+    ) -> None:
+        super().__init__(status.HTTP_503_SERVICE_UNAVAILABLE, detail, headers)
@@ -0,0 +1,43 @@
+"""bcrypt hashing and verification, as run in the hashing process pool.
+
+Pool workers are spawned processes that import this module to unpickle
+the functions they run, so it imports nothing from FastAPI or SQLAlchemy
+and loads passlib only on first use. Callers pass the cost factor in.
+"""
+_contexts = {}
+
+
+def crypt_context(rounds: int):
+    context = _contexts.get(rounds)
+    if context is None:
+        from passlib.context import CryptContext
+        context = _contexts[rounds] = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+    return context
+
+
+def hash_rounds(hashed_password: str) -> int:
+    # Modular crypt format: $2b$<rounds>$<salt+checksum>
+    try:
+        return int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return 0
+
+
+def hash_password(password: str, rounds: int) -> str:
+    return crypt_context(rounds).hash(password)
+
+
+def verify_and_update(plain_password: str, hashed_password: str, rounds: int):
+    """Return ``(valid, new_hash)``; ``new_hash`` is set when ``rounds`` changed."""
+    valid = crypt_context(rounds).verify(plain_password, hashed_password)
+    if valid and hash_rounds(hashed_password) != rounds:
+        return True, hash_password(plain_password, rounds)
+    return valid, None
+
+
+def warm_up(rounds: int) -> int:
+    # Submitted to each worker at startup, so spawning and imports happen
+    # before the first request.
+    import os
+    crypt_context(rounds)
+    return os.getpid()
@@ -0,0 +1,252 @@
+"""Bulk user import from NDJSON or CSV.
+
+    python -m app.importer users.ndjson
+    python -m app.importer users.csv --batch-size 2000 --workers 8
+    cat users.ndjson | python -m app.importer - --format ndjson
+
+Each record needs firstName, lastName and email (phone is optional), plus
+either ``password`` or ``hashed_password``, an existing bcrypt hash that is
+stored as is. Like /auth/register, every imported user gets a default
+organisation and a membership in it.
+
+Input is streamed through generators and handled one batch at a time, so
+memory stays flat whatever the file size:
+
+    read -> validate -> batch -> drop existing emails -> hash -> insert
+
+Emails already in the database are skipped before any hashing is done.
+Plaintext passwords are hashed in a process pool at BCRYPT_ROUNDS. Each
+batch is written in one transaction with multi-row INSERTs, and users
+that lose a race with a concurrent registration are skipped via
+ON CONFLICT DO NOTHING. Progress is reported on stderr.
+"""
+import argparse
+import csv
+import importlib
+import itertools
+import json
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from pydantic import BaseModel, EmailStr, ValidationError
+from sqlalchemy import func, select, update
+
+from app import models
+from app.hashing import hash_password
+from app.config import settings
+from app.crud import _chunks, new_id
+from app.db import get_engine
+
+BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
+
+
+class ImportRecord(BaseModel):
+    firstName: str
+    lastName: str
+    email: EmailStr
+    phone: Optional[str] = None
+    password: Optional[str] = None
+    hashed_password: Optional[str] = None
+
+
+@dataclass
+class ImportStats:
+    imported: int = 0
+    existing: int = 0
+    rejected: int = 0
+    started: float = 0.0
+
+    def report(self, out=sys.stderr, final=False):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        print(
+            f"{'done: ' if final else ''}imported {self.imported}, existing {self.existing}, "
+            f"rejected {self.rejected} ({self.imported / elapsed:.0f} users/s)",
+            file=out,
+        )
+
+
+def read_records(stream, fmt: str):
+    """Yield ``(line_number, dict)`` pairs from an NDJSON or CSV stream."""
+    if fmt == "csv":
+        # Line 1 is the header.
+        for number, row in enumerate(csv.DictReader(stream), start=2):
+            yield number, {key: value for key, value in row.items() if value not in (None, "")}
+        return
+    for number, line in enumerate(stream, start=1):
+        if line.strip():
+            try:
+                yield number, json.loads(line)
+            except ValueError as exc:
+                yield number, exc
+
+
+def validate(records, stats: ImportStats, err=sys.stderr):
+    """Yield valid ``ImportRecord``s, counting and reporting the rest."""
+    for number, raw in records:
+        error = raw if isinstance(raw, Exception) else None
+        if error is None:
+            try:
+                record = ImportRecord.model_validate(raw)
+            except ValidationError as exc:
+                error = exc
+            else:
+                if record.hashed_password and not record.hashed_password.startswith(BCRYPT_PREFIXES):
+                    error = "hashed_password is not a bcrypt hash"
+                elif not (record.password or record.hashed_password):
+                    error = "password or hashed_password is required"
+        if error is not None:
+            stats.rejected += 1
+            print(f"line {number}: rejected: {str(error).splitlines()[0]}", file=err)
+            continue
+        yield record
+
+
+def batched(iterable, size: int):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def drop_existing(conn, batch, stats: ImportStats):
+    """Remove records whose email is taken or repeated within the batch."""
+    emails = [record.email.lower() for record in batch]
+    taken = set()
+    for chunk in _chunks(list(set(emails))):
+        taken.update(conn.execute(
+            select(func.lower(models.User.email)).where(func.lower(models.User.email).in_(chunk))
+        ).scalars())
+    fresh = []
+    for email, record in zip(emails, batch):
+        if email in taken:
+            stats.existing += 1
+            continue
+        taken.add(email)
+        fresh.append(record)
+    return fresh
+
+
+def hash_passwords(batch, pool: Optional[ProcessPoolExecutor] = None, workers: int = 1):
+    """Fill in ``hashed_password`` for records that only carry a password."""
+    pending = [record for record in batch if not record.hashed_password]
+    passwords = [record.password for record in pending]
+    rounds = itertools.repeat(settings.BCRYPT_ROUNDS)
+    if pool is None:
+        hashes = map(hash_password, passwords, rounds)
+    else:
+        chunksize = max(len(passwords) // (workers * 4), 1)
+        hashes = pool.map(hash_password, passwords, rounds, chunksize=chunksize)
+    for record, hashed in zip(pending, hashes):
+        record.hashed_password = hashed
+    return batch
+
+
+def insert_batch(conn, batch):
+    """Write users, default organisations and memberships; return the count."""
+    dialect = importlib.import_module(f"sqlalchemy.dialects.{conn.dialect.name}")
+    users = {}
+    for record in batch:
+        userId = new_id()
+        users[userId] = {
+            "userId": userId,
+            "firstName": record.firstName,
+            "lastName": record.lastName,
+            "email": record.email,
+            "hashed_password": record.hashed_password,
+            "phone": record.phone,
+        }
+    inserted = []
+    for chunk in _chunks(list(users.values())):
+        stmt = (
+            dialect.insert(models.User.__table__)
+            .values(chunk)
+            .on_conflict_do_nothing()
+            .returning(models.User.userId)
+        )
+        inserted.extend(conn.execute(stmt).scalars())
+    if not inserted:
+        return 0
+
+    orgs, members = [], []
+    for userId in inserted:
+        orgId = new_id()
+        orgs.append({
+            "orgId": orgId,
+            "name": f"{users[userId]['firstName']}'s Organisation",
+            "description": "Default organisation",
+            "creator_id": userId,
+            "member_count": 1,
+        })
+        members.append({"id": new_id(), "userId": userId, "orgId": orgId})
+    conn.execute(models.Organisation.__table__.insert(), orgs)
+    conn.execute(models.User_organisation.__table__.insert(), members)
+    # name_key is filled in by the database, as crud.org_name_key does, so
+    # it matches the lower() that search compares with.
+    name_key = (
+        select(func.lower(models.Organisation.name))
+        .where(models.Organisation.orgId == models.User_organisation.orgId)
+        .scalar_subquery()
+    )
+    for chunk in _chunks([org["orgId"] for org in orgs]):
+        conn.execute(
+            update(models.User_organisation)
+            .where(models.User_organisation.orgId.in_(chunk))
+            .values(name_key=name_key)
+        )
+    return len(inserted)
+
+
+def run(stream, fmt: str = "ndjson", batch_size: int = 1000, workers: int = 0,
+        progress_every: int = 10, err=sys.stderr) -> ImportStats:
+    """Import users from ``stream``. ``workers=0`` hashes in this process."""
+    stats = ImportStats(started=time.perf_counter())
+    pool = None
+    if workers:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    engine = get_engine()
+    try:
+        records = validate(read_records(stream, fmt), stats, err=err)
+        for number, batch in enumerate(batched(records, batch_size), start=1):
+            with engine.connect() as conn:
+                batch = drop_existing(conn, batch, stats)
+            if batch:
+                # Hash outside any transaction; it's the slow part.
+                hash_passwords(batch, pool, workers)
+                with engine.begin() as conn:
+                    added = insert_batch(conn, batch)
+                stats.imported += added
+                stats.existing += len(batch) - added
+            if progress_every and number % progress_every == 0:
+                stats.report(err)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    stats.report(err, final=True)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="input file, or - for stdin")
+    parser.add_argument("--format", choices=["ndjson", "csv"],
+                        help="input format (default: from the file extension, else ndjson)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(),
+                        help="bcrypt processes; 0 hashes inline (default: CPU count)")
+    parser.add_argument("--progress-every", type=int, default=10, help="report every N batches")
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+    if args.path == "-":
+        stats = run(sys.stdin, fmt, args.batch_size, args.workers, args.progress_every)
+    else:
+        with open(args.path, newline="", encoding="utf-8") as stream:
+            stats = run(stream, fmt, args.batch_size, args.workers, args.progress_every)
+    return 1 if stats.rejected else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
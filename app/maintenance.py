@@ -0,0 +1,33 @@
+"""Periodic database housekeeping, meant for cron or a scheduled container.
+
+    python -m app.maintenance
+
+Drops expired refresh tokens and denylist rows, and repairs organisation
+member counts that have drifted from the membership table.
+"""
+import argparse
+import asyncio
+
+from app import crud
+from app.db import get_async_sessionmaker
+
+
+async def run():
+    async with get_async_sessionmaker()() as db:
+        async with crud.unit_of_work(db):
+            results = {
+                "expired refresh tokens": await crud.purge_expired_refresh_tokens(db, commit=False),
+                "expired revoked tokens": await crud.purge_expired_revoked_tokens(db, commit=False),
+                "member counts repaired": await crud.reconcile_member_counts(db, commit=False),
+            }
+    return results
+
+
+def main():
+    argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter).parse_args()
+    for name, count in asyncio.run(run()).items():
+        print(f"{name}: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""Request timing, SQL and bcrypt instrumentation in Prometheus text format.
+
+``MetricsMiddleware`` opens a ``RequestStats`` for every HTTP request. SQL
+statements (via engine events) and bcrypt calls (via ``record_bcrypt``) add
+to it. When the response starts, the request is recorded in the histograms
+and summarised in a ``Server-Timing`` header. ``render()`` produces the
+body of ``GET /metrics``.
+"""
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues):
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                # Per-bucket counts plus a final +Inf slot, then sum.
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labelvalues, counts, total in sorted(series):
+            labels = _labels(self.labelnames, labelvalues)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{{{labels + ',' if labels else ''}{le}}} {cumulative}")
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+def _labels(names, values):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _sample(name: str, documentation: str, kind: str, value):
+    return [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}", f"{name} {value}"]
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "Time to the start of the response.", ("method", "route", "status"),
+)
+request_statements = Histogram(
+    "http_request_db_statements", "SQL statements executed per request.", ("route",), COUNT_BUCKETS,
+)
+request_db_time = Histogram(
+    "http_request_db_seconds", "Time spent executing SQL per request.", ("route",),
+)
+bcrypt_duration = Histogram(
+    "bcrypt_duration_seconds", "Wall time of bcrypt operations, including pool queueing.", ("operation",),
+)
+
+
+class RequestStats:
+    __slots__ = ("scope", "statements", "db_seconds", "bcrypt_seconds")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.bcrypt_seconds = 0.0
+
+    @property
+    def route(self):
+        # Routing fills in scope["route"] before the handler runs.
+        return route_name(self.scope)
+
+
+current_request = contextvars.ContextVar("current_request", default=None)
+
+
+def record_bcrypt(operation: str, seconds: float):
+    bcrypt_duration.observe(seconds, operation)
+    stats = current_request.get()
+    if stats is not None:
+        stats.bcrypt_seconds += seconds
+
+
+# The start time is kept on the execution context, which is dropped with
+# the statement. after_cursor_execute doesn't fire when a statement raises,
+# so anything kept on the pooled connection would pile up there. Statements
+# run without a context (sequence and default pre-executions) are counted
+# but not timed.
+START_ATTRIBUTE = "_metrics_query_start"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        setattr(context, START_ATTRIBUTE, time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, START_ATTRIBUTE, None)
+    elapsed = time.perf_counter() - start if start is not None else 0.0
+    stats = current_request.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += elapsed
+
+
+def route_name(scope):
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so the handler runs in the same context."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - start
+                route = stats.route
+                request_duration.observe(elapsed, scope["method"], route, message["status"])
+                request_statements.observe(stats.statements, route)
+                request_db_time.observe(stats.db_seconds, route)
+                timing = (
+                    f'app;dur={elapsed * 1000:.2f}, '
+                    f'db;dur={stats.db_seconds * 1000:.2f};desc="{stats.statements} queries"'
+                )
+                if stats.bcrypt_seconds:
+                    timing += f", bcrypt;dur={stats.bcrypt_seconds * 1000:.2f}"
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_request.reset(token)
+
+
+def render(extra_lines=()):
+    lines = []
+    for histogram in (request_duration, request_statements, request_db_time, bcrypt_duration):
+        lines.extend(histogram.render())
+    lines.extend(extra_lines)
+    return "\n".join(lines) + "\n"
+
+
+_POOL_METRICS = {
+    "checkedOut": ("db_pool_checked_out", "Connections currently checked out.", "gauge"),
+    "checkedIn": ("db_pool_checked_in", "Idle connections in the pool.", "gauge"),
+    "overflow": ("db_pool_overflow", "Connections open beyond pool_size.", "gauge"),
+    "size": ("db_pool_size", "Configured pool size.", "gauge"),
+    "waitCount": ("db_pool_checkouts_total", "Connections checked out of the pool.", "counter"),
+    "waitSecondsTotal": ("db_pool_checkout_wait_seconds_total", "Time spent waiting for a pooled connection.", "counter"),
+    "waitSecondsMax": ("db_pool_checkout_wait_seconds_max", "Longest wait for a pooled connection.", "gauge"),
+}
+
+
+def pool_metrics(stats):
+    """Prometheus lines for ``app.db.pool_stats()``."""
+    lines = []
+    for key, (name, documentation, kind) in _POOL_METRICS.items():
+        if key in stats:
+            lines.extend(_sample(name, documentation, kind, stats[key]))
+    return lines
+
+
+def counter(name: str, documentation: str, value):
+    return _sample(name, documentation, "counter", value)
+
+
+def cache_metrics(prefix: str, stats):
+    """Prometheus lines for ``TTLCache.stats()``."""
+    return (
+        _sample(f"{prefix}_cache_hits_total", "Cache hits.", "counter", stats["hits"])
+        + _sample(f"{prefix}_cache_misses_total", "Cache misses.", "counter", stats["misses"])
+        + _sample(f"{prefix}_cache_entries", "Entries currently cached.", "gauge", stats["size"])
+    )
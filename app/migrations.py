@@ -0,0 +1,34 @@
+import logging
+import os
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+
+def head_revision():
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    return ScriptDirectory.from_config(Config(ALEMBIC_INI)).get_current_head()
+
+
+async def check_schema(engine):
+    """Warn when the database isn't migrated to the code's head revision.
+
+    Reads the single-row ``alembic_version`` table instead of reflecting the
+    schema, so the check costs one query.
+    """
+    expected = head_revision()
+    try:
+        async with engine.connect() as conn:
+            current = (await conn.execute(text("SELECT version_num FROM alembic_version"))).scalar()
+    except Exception:
+        logger.warning("Could not read alembic_version; run `alembic upgrade head`", exc_info=True)
+        return False
+    if current != expected:
+        logger.warning("Database schema is at revision %s, expected %s; run `alembic upgrade head`", current, expected)
+        return False
+    return True
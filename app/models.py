@@ -1,26 +1,102 @@
-from sqlalchemy import Column, String, ForeignKey, Table
+import uuid
+
+from sqlalchemy import BINARY, Column, DateTime, Integer, String, ForeignKey, Index, LargeBinary, Table, func
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import relationship
+from sqlalchemy.types import TypeDecorator
 from app.db import Base
 
+NIL_UUID = uuid.UUID(int=0)
+
+
+def canonical_id(value):
+    """Return ``value`` as a lowercase hyphenated UUID, or ``None`` if it isn't one.
+
+    Keys are compared as strings in memory (the membership index, bulk
+    results), so ids from clients are normalised before they are used.
+    """
+    try:
+        return str(uuid.UUID(value))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+class UUIDKey(TypeDecorator):
+    """UUID key stored as native ``uuid`` on PostgreSQL and 16 bytes elsewhere.
+
+    Python values stay canonical 36-character strings, so the API is
+    unchanged. A string that isn't a UUID is bound as the nil UUID, so
+    looking up a malformed id finds nothing instead of raising.
+    """
+    impl = BINARY(16)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(postgresql.UUID(as_uuid=True))
+        return dialect.type_descriptor(BINARY(16))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if not isinstance(value, uuid.UUID):
+            try:
+                value = uuid.UUID(value)
+            except (TypeError, ValueError, AttributeError):
+                value = NIL_UUID
+        return value if dialect.name == "postgresql" else value.bytes
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            value = uuid.UUID(bytes=bytes(value))
+        return str(value)
+
 
 
 
 class User_organisation(Base):
     __tablename__ = "users_organisation"
-    id = Column(String, primary_key=True, index=True, unique=True)
-    userId = Column(String , ForeignKey('users.userId'))
-    orgId = Column(String, ForeignKey('organisations.orgId'))
+    __table_args__ = (
+        # Serves "orgs of a user" lookups and rejects duplicate memberships.
+        Index("uq_users_organisation_user_org", "userId", "orgId", unique=True),
+        # Serves "members of an org" lookups.
+        Index("ix_users_organisation_org_user", "orgId", "userId"),
+        # Prefix search of a user's organisations in (name_key, orgId) order,
+        # see ``crud.search_organisations``. On PostgreSQL migration 0009
+        # builds it with COLLATE "C" so range scans compare bytes, as
+        # SQLite's default collation does.
+        Index("ix_users_organisation_user_name", "userId", "name_key", "orgId"),
+    )
+    id = Column(UUIDKey, primary_key=True)
+    userId = Column(UUIDKey, ForeignKey('users.userId'))
+    orgId = Column(UUIDKey, ForeignKey('organisations.orgId'))
+    # lower(name) of the organisation, copied in by the database when the
+    # membership is written (see ``crud.org_name_key``). Organisations are
+    # never renamed, so it doesn't go stale.
+    name_key = Column(String)
+
+    # Many-to-one links let the unit of work order inserts parent-first when
+    # a user, organisation and membership are flushed together.
+    user = relationship("User", foreign_keys=[userId])
+    organisation = relationship("Organisation", foreign_keys=[orgId])
 
 class User(Base):
     __tablename__ = "users"
 
-    userId = Column(String, primary_key=True, index=True, unique=True)
+    userId = Column(UUIDKey, primary_key=True)
     firstName = Column(String, nullable=False)
     lastName = Column(String, nullable=False)
-    email = Column(String, unique=True, index=True, nullable=False)
+    # Unique through uq_users_email_lower, which also covers exact matches.
+    email = Column(String, nullable=False)
     hashed_password = Column(String, nullable=False)
     phone = Column(String)
-    
+
+    __table_args__ = (
+        Index("uq_users_email_lower", func.lower(email), unique=True),
+    )
+
     #organisations = relationship("Organisation", secondary="user_organisation", back_populates="users")
     # organisations = relationship(
     #     "Organisation",
@@ -32,10 +108,22 @@ class User(Base):
 class Organisation(Base):
     __tablename__ = "organisations"
 
-    orgId = Column(String, primary_key=True, index=True, unique=True)
-    name = Column(String, nullable=False)
+    orgId = Column(UUIDKey, primary_key=True)
+    name = Column(String, nullable=False, index=True)
     description = Column(String)
-    creator_id = Column(String, ForeignKey('users.userId'))
+    creator_id = Column(UUIDKey, ForeignKey('users.userId'))
+    # Denormalized COUNT of users_organisation rows, maintained by the crud
+    # membership functions and repaired by ``crud.reconcile_member_counts``.
+    member_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Copy of ``name`` for organisations created through the API, NULL for
+    # default ones, which may share names. Its unique index backs the
+    # conditional INSERT in ``crud.create_organisation`` under concurrency.
+    unique_name = Column(String)
+    creator = relationship("User", foreign_keys=[creator_id])
+
+    __table_args__ = (
+        Index("uq_organisations_unique_name", unique_name, unique=True),
+    )
 
     #users = relationship("User", secondary="user_organisation", back_populates="organisations")
     # users = relationship(
@@ -45,3 +133,25 @@ class Organisation(Base):
     # )
 
 
+class RefreshToken(Base):
+    """One issued refresh token. Rotation marks it used and issues a successor
+    in the same family; presenting a used token again revokes the family."""
+    __tablename__ = "refresh_tokens"
+
+    id = Column(String, primary_key=True)
+    family_id = Column(String, nullable=False, index=True)
+    userId = Column(UUIDKey, ForeignKey('users.userId'), nullable=False)
+    # SHA-256 of the token's secret half; the secret itself is never stored.
+    token_hash = Column(LargeBinary(32), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime)
+
+    user = relationship("User", foreign_keys=[userId])
+
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String, primary_key=True)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=False, index=True)
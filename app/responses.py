@@ -0,0 +1,59 @@
+import csv
+import hashlib
+import io
+
+import orjson
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored.
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def etag_response(request: Request, content: dict, status_code: int = 200) -> Response:
+    """Serialize ``content`` once and answer conditional GETs with a 304.
+
+    The strong ETag is a hash of the exact response body.
+    """
+    body = orjson.dumps(content)
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    # Authenticated data: clients may keep a copy but must revalidate it.
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, status_code=status_code, media_type="application/json", headers=headers)
+
+
+async def _encode(batches, fmt: str, fields):
+    if fmt == "ndjson":
+        async for rows in batches:
+            yield b"".join(orjson.dumps(row) + b"\n" for row in rows)
+        return
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    yield buffer.getvalue().encode()
+    async for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+
+
+def export_response(batches, fmt: str, fields, filename: str) -> StreamingResponse:
+    """Stream ``batches`` (an async iterator of lists of dicts) as NDJSON or CSV.
+
+    Each batch is written as one chunk as soon as it is read, so the first
+    bytes go out before the whole result has been fetched.
+    """
+    return StreamingResponse(
+        _encode(batches, fmt, fields),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
@@ -0,0 +1,85 @@
+"""In-memory denylist of revoked access tokens.
+
+Access tokens carry a ``jti`` claim. Revoking one writes a row to
+``revoked_tokens`` and adds the jti to this process's ``denylist``, an
+expiring set. Other processes pick the row up on their next sync, at most
+``REVOCATION_SYNC_SECONDS`` later. Each sync reads only rows revoked since
+the previous one. Checking a token is a dict lookup, so authentication
+still makes no query for revocation.
+"""
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.config import settings
+
+# Rows revoked this close to the last sync are read again, to allow for clock
+# skew between app servers.
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+class Denylist:
+    def __init__(self):
+        self._expiry = {}
+        self._watermark = None
+        self._last_sync = None
+        self._syncing = False
+
+    def __contains__(self, jti):
+        expires_at = self._expiry.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def __len__(self):
+        return len(self._expiry)
+
+    def add(self, jti: str, expires_at: float):
+        if expires_at > time.time():
+            self._expiry[jti] = expires_at
+
+    def purge(self):
+        now = time.time()
+        self._expiry = {jti: expires_at for jti, expires_at in self._expiry.items() if expires_at > now}
+
+    def is_stale(self):
+        return self._last_sync is None or time.monotonic() - self._last_sync >= settings.REVOCATION_SYNC_SECONDS
+
+    async def sync(self, db: AsyncSession):
+        """Load revocations recorded since the last sync."""
+        if self._syncing:
+            return
+        self._syncing = True
+        try:
+            started = datetime.utcnow()
+            query = select(models.RevokedToken.jti, models.RevokedToken.expires_at).where(
+                models.RevokedToken.expires_at > started
+            )
+            if self._watermark is not None:
+                query = query.where(models.RevokedToken.revoked_at >= self._watermark - SYNC_OVERLAP)
+            for jti, expires_at in (await db.execute(query)).all():
+                self.add(jti, _timestamp(expires_at))
+            self.purge()
+            self._watermark = started
+            self._last_sync = time.monotonic()
+        finally:
+            self._syncing = False
+
+    async def revoke(self, db: AsyncSession, jti: str, expires_at: float, commit: bool = True):
+        db.add(models.RevokedToken(
+            jti=jti,
+            expires_at=datetime.utcfromtimestamp(expires_at),
+            revoked_at=datetime.utcnow(),
+        ))
+        if commit:
+            await db.commit()
+        self.add(jti, expires_at)
+
+
+def _timestamp(value: datetime) -> float:
+    # Stored as naive UTC, like the token expiry it mirrors.
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+
+denylist = Denylist()
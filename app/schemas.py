@@ -1,6 +1,8 @@
-from pydantic import BaseModel, EmailStr, constr
+from pydantic import BaseModel, EmailStr, Field, constr, field_validator
 from typing import List, Optional
 
+from app.models import canonical_id
+
 class UserBase(BaseModel):
     firstName: str
     lastName: str
@@ -20,6 +22,21 @@ class UserResponse(UserBase):
 class UserOrgs(BaseModel):
     userId : str   
 
+    # Malformed ids are kept as sent; they match no user and are reported
+    # as not found.
+    @field_validator("userId")
+    @classmethod
+    def canonical_user_id(cls, value):
+        return canonical_id(value) or value
+
+class UserOrgsBulk(BaseModel):
+    userIds: List[str] = Field(min_length=1, max_length=5000)
+
+    @field_validator("userIds")
+    @classmethod
+    def canonical_user_ids(cls, values):
+        return [canonical_id(value) or value for value in values]
+
 class OrganisationBase(BaseModel):
     name: str
     description: Optional[str] = None
@@ -34,6 +51,73 @@ class UserOrgsCreate(BaseModel):
     userId: str
     orgId: str
 
+class OrganisationList(BaseModel):
+    organisations: List[OrganisationResponse]
+    nextCursor: Optional[str] = None
+
+class MemberList(BaseModel):
+    users: List[UserResponse]
+    nextCursor: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refreshToken: str
+
+class LogoutRequest(BaseModel):
+    refreshToken: Optional[str] = None
+
+class TokenData(BaseModel):
+    accessToken: str
+    refreshToken: str
+
+class AuthData(TokenData):
+    user: UserResponse
+
+# Response envelopes. Handlers serialize with orjson directly, these describe
+# the payloads for the OpenAPI schema.
+class SuccessResponse(BaseModel):
+    status: str
+    message: str
+
+class AuthResponse(SuccessResponse):
+    data: AuthData
+
+class TokenResponse(SuccessResponse):
+    data: TokenData
+
+class UserDataResponse(SuccessResponse):
+    data: UserResponse
+
+class OrganisationListResponse(SuccessResponse):
+    data: OrganisationList
+
+class OrganisationDataResponse(SuccessResponse):
+    data: OrganisationResponse
+
+class MemberListResponse(SuccessResponse):
+    data: MemberList
+
+class OrganisationStats(BaseModel):
+    orgId: str
+    memberCount: int
+
+class OrganisationStatsList(BaseModel):
+    organisations: List[OrganisationStats]
+
+class OrganisationStatsResponse(SuccessResponse):
+    data: OrganisationStatsList
+
+class BulkMembershipResult(BaseModel):
+    userId: str
+    # "added", "already_member", "not_found" or "duplicate"
+    status: str
+
+class BulkMembershipData(BaseModel):
+    added: int
+    results: List[BulkMembershipResult]
+
+class BulkMembershipResponse(SuccessResponse):
+    data: BulkMembershipData
+
 class ErrorSchema(BaseModel):
     status: str
     message: str
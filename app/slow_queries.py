@@ -0,0 +1,159 @@
+"""Opt-in slow-query log with EXPLAIN capture.
+
+With ``SLOW_QUERY_MS`` set, every SQL statement slower than the threshold
+is logged to the ``app.slow_queries`` logger. The log line has the
+statement, the shape of its bound parameters (types only, never values)
+and the route that issued it. Unless ``SLOW_QUERY_EXPLAIN`` is off, the
+plan is then fetched in the background on a separate connection and
+logged under the same id. Each distinct statement is explained at most
+once per ``SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS``.
+"""
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.cache import TTLCache
+from app.config import settings
+from app.metrics import current_request
+
+logger = logging.getLogger(__name__)
+
+EXPLAIN_PREFIXES = {
+    "postgresql": "EXPLAIN ",
+    "sqlite": "EXPLAIN QUERY PLAN ",
+}
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+# Set on the connections that run EXPLAIN so they aren't recorded themselves.
+IGNORE_OPTION = "slow_query_ignore"
+MAX_PENDING_EXPLAINS = 4
+START_ATTRIBUTE = "_slow_query_start"
+
+slow_query_count = 0
+_ids = itertools.count(1)
+_explained = TTLCache(maxsize=1024, ttl=settings.SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS)
+_pending = threading.BoundedSemaphore(MAX_PENDING_EXPLAINS)
+_executor = None
+_async_engines = {}
+_tasks = set()
+_installed = False
+
+
+def parameter_shape(parameters):
+    """Describe bound parameters by type, e.g. ``{'name': 'str'}`` or ``['str', 'int']``."""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # On the execution context rather than conn.info, as in app.metrics: a
+    # statement that raises never reaches after_cursor_execute.
+    if context is not None:
+        setattr(context, START_ATTRIBUTE, time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    global slow_query_count
+    start = getattr(context, START_ATTRIBUTE, None)
+    if start is None or context.execution_options.get(IGNORE_OPTION):
+        return
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if elapsed_ms < settings.SLOW_QUERY_MS:
+        return
+    slow_query_count += 1
+    query_id = next(_ids)
+    stats = current_request.get()
+    route = stats.route if stats is not None else None
+    if executemany:
+        shape = {"rows": len(parameters), "row": parameter_shape(parameters[0]) if parameters else None}
+    else:
+        shape = parameter_shape(parameters)
+    logger.warning(
+        "slow query #%d: %.1fms route=%s params=%s sql=%s",
+        query_id, elapsed_ms, route, shape, " ".join(statement.split()),
+    )
+    if settings.SLOW_QUERY_EXPLAIN and not executemany:
+        _schedule_explain(query_id, conn.engine, statement, parameters)
+
+
+def _schedule_explain(query_id, engine, statement, parameters):
+    prefix = EXPLAIN_PREFIXES.get(engine.dialect.name)
+    if prefix is None or not statement.lstrip().upper().startswith(EXPLAINABLE):
+        return
+    if _explained.get(statement) is not None:
+        return
+    if not _pending.acquire(blocking=False):
+        return
+    _explained.set(statement, True)
+    sql = prefix + statement
+    if engine.dialect.is_async:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            _pending.release()
+            return
+        task = loop.create_task(_explain_async(query_id, engine, sql, parameters))
+        # The loop only keeps weak references to tasks.
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+    else:
+        _get_executor().submit(_explain_sync, query_id, engine, sql, parameters)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+    return _executor
+
+
+def _log_plan(query_id, rows):
+    if not rows:
+        return
+    plan = "\n".join(" | ".join(str(value) for value in row) for row in rows)
+    logger.warning("slow query #%d plan:\n%s", query_id, plan)
+
+
+def _explain_sync(query_id, engine, sql, parameters):
+    try:
+        with engine.connect() as conn:
+            conn = conn.execution_options(**{IGNORE_OPTION: True})
+            _log_plan(query_id, conn.exec_driver_sql(sql, parameters).fetchall())
+    except Exception:
+        logger.warning("slow query #%d: EXPLAIN failed", query_id, exc_info=True)
+    finally:
+        _pending.release()
+
+
+async def _explain_async(query_id, sync_engine, sql, parameters):
+    try:
+        engine = _async_engines.get(sync_engine)
+        if engine is None:
+            engine = _async_engines[sync_engine] = AsyncEngine(sync_engine)
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(**{IGNORE_OPTION: True})
+            result = await conn.exec_driver_sql(sql, parameters)
+            _log_plan(query_id, result.fetchall())
+    except Exception:
+        logger.warning("slow query #%d: EXPLAIN failed", query_id, exc_info=True)
+    finally:
+        _pending.release()
+
+
+def install():
+    """Start recording if SLOW_QUERY_MS is set; a no-op otherwise."""
+    global _installed
+    if _installed or settings.SLOW_QUERY_MS is None:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    _installed = True
@@ -0,0 +1,95 @@
+"""Cold-start benchmark: time to import ``main`` and to serve the first requests.
+
+Each run starts a fresh interpreter, the way a serverless instance would, so
+import time, lazy engine creation and the first database connection are all
+included. Runs against a local SQLite database unless DATABASE_URL is set.
+
+    python benchmarks/cold_start.py --runs 10 --top 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(main.app)
+before = time.perf_counter()
+client.get("/")
+first = time.perf_counter()
+client.post("/auth/login", json={"email": "nobody@example.com", "password": "x"})
+first_db = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "first_request_ms": (first - before) * 1000,
+    "first_db_request_ms": (first_db - first) * 1000,
+}))
+"""
+
+
+def _env(database_url):
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", database_url)
+    env.setdefault("SECRET_KEY", "benchmark")
+    env.setdefault("DB_POOL_PROFILE", "serverless")
+    return env
+
+
+def _migrate(env):
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=ROOT, env=env, check=True, capture_output=True)
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def _slowest_imports(env, top):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        # "import time: <self us> | <cumulative us> | <indented module name>"
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        rows.append((int(parts[0].split(":")[1]), int(parts[1]), parts[2].strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=0, help="also list the N imports with the highest self time")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="hng-cold-start-")
+    env = _env(f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    _migrate(env)
+
+    samples = []
+    for _ in range(args.runs):
+        result = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    print(f"{'metric':<22}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for metric in ("import_ms", "first_request_ms", "first_db_request_ms"):
+        values = [sample[metric] for sample in samples]
+        print(f"{metric:<22}{statistics.median(values):>10.1f}{_percentile(values, 95):>10.1f}{max(values):>10.1f}")
+
+    if args.top:
+        print(f"\n{'module':<44}{'self ms':>10}{'cumulative ms':>15}")
+        for own, cumulative, name in _slowest_imports(env, args.top):
+            print(f"{name:<44}{own / 1000:>10.1f}{cumulative / 1000:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""In-process load and latency benchmark for every API endpoint.
+
+Runs ``main.app`` through httpx's ASGI transport against a throwaway SQLite
+database (or DATABASE_URL, migrated with Alembic), seeded with a user who
+belongs to many organisations and an organisation with many members.
+
+For each endpoint it reports throughput and p50/p95/p99 latency, then
+replays a single request with empty principal and membership caches and fails (exit
+status 1) if it ran more SQL statements than the endpoint's budget, so N+1
+regressions are caught.
+
+    python benchmarks/endpoints.py --requests 500 --concurrency 20
+    python benchmarks/endpoints.py --check-only        # statement budgets only
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Maximum SQL statements per request, principal lookup included.
+STATEMENT_BUDGETS = {
+    "register": 4,
+    "login": 2,
+    "user fetch": 2,
+    "org list": 2,
+    "org fetch": 3,
+    "member list": 3,
+    "add member": 4,
+}
+
+
+def _configure(args):
+    if not os.environ.get("DATABASE_URL"):
+        path = os.path.join(tempfile.mkdtemp(prefix="hng-bench-"), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("BCRYPT_ROUNDS", str(args.bcrypt_rounds))
+    os.environ.setdefault("DB_STARTUP_CHECK", "false")
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=ROOT, check=True, capture_output=True)
+    sys.path.insert(0, ROOT)
+
+
+def _seed(args):
+    """Bulk-insert the fixture data with the sync engine; returns ids used by the scenarios."""
+    from sqlalchemy import insert
+
+    from app import models
+    from app.db import get_engine
+    from app.hashing import hash_password
+
+    password_hash = hash_password("password123", int(os.environ["BCRYPT_ROUNDS"]))
+    users = [
+        {
+            "userId": str(uuid.uuid4()),
+            "firstName": "Seed",
+            "lastName": f"User{i}",
+            "email": f"seed{i}@example.com",
+            "hashed_password": password_hash,
+            "phone": None,
+        }
+        for i in range(args.users)
+    ]
+    heavy, crowd = users[0], users[1:]
+    orgs = [
+        {"orgId": str(uuid.uuid4()), "name": f"Org {i}", "description": "Seeded", "creator_id": heavy["userId"]}
+        for i in range(args.orgs_per_user)
+    ]
+    big_org = orgs[0]
+    members = [{"id": str(uuid.uuid4()), "userId": heavy["userId"], "orgId": org["orgId"]} for org in orgs]
+    joined = crowd[:args.members_per_org]
+    members += [{"id": str(uuid.uuid4()), "userId": user["userId"], "orgId": big_org["orgId"]} for user in joined]
+
+    with get_engine().begin() as conn:
+        conn.execute(insert(models.User), users)
+        conn.execute(insert(models.Organisation), orgs)
+        conn.execute(insert(models.User_organisation), members)
+    return {
+        "heavy": heavy,
+        "org_id": orgs[-1]["orgId"],
+        "big_org_id": big_org["orgId"],
+        # Users not yet in the heavy user's last organisation, for add-member.
+        "candidates": [user["userId"] for user in crowd],
+    }
+
+
+def _scenarios(fixtures, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    heavy = fixtures["heavy"]
+    emails = (f"bench{uuid.uuid4().hex}@example.com" for _ in itertools.count())
+    candidates = iter(fixtures["candidates"])
+    return {
+        "register": lambda: ("POST", "/auth/register", {"json": {
+            "firstName": "Bench", "lastName": "User", "email": next(emails), "password": "password123",
+        }}, 201),
+        "login": lambda: ("POST", "/auth/login", {"json": {"email": heavy["email"], "password": "password123"}}, 200),
+        "user fetch": lambda: ("GET", f"/api/users/{heavy['userId']}", {"headers": headers}, 200),
+        "org list": lambda: ("GET", "/api/organisations?limit=100", {"headers": headers}, 200),
+        "org fetch": lambda: ("GET", f"/api/organisations/{fixtures['org_id']}", {"headers": headers}, 200),
+        "member list": lambda: ("GET", f"/api/organisations/{fixtures['big_org_id']}/users?limit=100", {"headers": headers}, 200),
+        "add member": lambda: ("POST", f"/api/organisations/{fixtures['org_id']}/users", {
+            "headers": headers, "json": {"userId": next(candidates)},
+        }, 200),
+    }
+
+
+async def _request(client, spec):
+    method, url, kwargs, expected = spec
+    response = await client.request(method, url, **kwargs)
+    if response.status_code != expected:
+        raise RuntimeError(f"{method} {url} returned {response.status_code}: {response.text}")
+
+
+async def _load(client, make_spec, requests, concurrency):
+    latencies = []
+    specs = iter([make_spec() for _ in range(requests)])
+
+    async def worker():
+        for spec in specs:
+            start = time.perf_counter()
+            await _request(client, spec)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+async def run(args):
+    import httpx
+
+    from app.auth import create_access_token
+    from app.cache import membership_index, principal_cache
+    from app.db import get_async_engine, get_async_sessionmaker
+    from app.revocation import denylist
+    from main import app
+
+    fixtures = _seed(args)
+    token = create_access_token({"sub": fixtures["heavy"]["userId"]})
+    scenarios = _scenarios(fixtures, token)
+    counter = StatementCounter(get_async_engine().sync_engine)
+    # Load the revocation denylist up front, as a warm process would have.
+    async with get_async_sessionmaker()() as db:
+        await denylist.sync(db)
+
+    failures = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        if not args.check_only:
+            print(f"{'endpoint':<12}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+            for name, make_spec in scenarios.items():
+                latencies, elapsed = await _load(client, make_spec, args.requests, args.concurrency)
+                ms = [latency * 1000 for latency in latencies]
+                print(f"{name:<12}{len(ms) / elapsed:>10.1f}{statistics.median(ms):>10.2f}"
+                      f"{_percentile(ms, 95):>10.2f}{_percentile(ms, 99):>10.2f}")
+            print()
+
+        print(f"{'endpoint':<12}{'statements':>12}{'budget':>8}")
+        for name, make_spec in scenarios.items():
+            principal_cache.clear()
+            membership_index.clear()
+            counter.count = 0
+            await _request(client, make_spec())
+            budget = STATEMENT_BUDGETS[name]
+            print(f"{name:<12}{counter.count:>12}{budget:>8}")
+            if counter.count > budget:
+                failures.append(f"{name}: {counter.count} statements (budget {budget})")
+
+    if failures:
+        print("\nStatement budget exceeded:\n  " + "\n  ".join(failures), file=sys.stderr)
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--orgs-per-user", type=int, default=500)
+    parser.add_argument("--members-per-org", type=int, default=2000)
+    parser.add_argument("--bcrypt-rounds", type=int, default=4,
+                        help="bcrypt cost for the run (production uses BCRYPT_ROUNDS, default 12)")
+    parser.add_argument("--check-only", action="store_true", help="only check statement budgets")
+    args = parser.parse_args()
+    # Every add-member request needs a user who isn't in the target org yet.
+    add_member_requests = 1 if args.check_only else args.requests + 1
+    if args.users < max(args.members_per_org, add_member_requests) + 1:
+        parser.error("--users must exceed --members-per-org and --requests")
+
+    _configure(args)
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Insert throughput and primary-key index size: uuid4 against uuid7.
+
+Inserts ``--rows`` rows into a scratch table keyed like the real ones
+(``models.UUIDKey``, 16 bytes or native uuid) once per ID strategy, with
+multi-row batches. Throughput is reported for each tenth of the run, so
+the slowdown as the index outgrows the cache shows up as the table grows.
+At the end the primary-key index size is reported.
+
+Runs against a throwaway SQLite file, or DATABASE_URL when it is set. On
+PostgreSQL the scratch table is dropped afterwards.
+
+    python benchmarks/ids.py --rows 2000000
+    python benchmarks/ids.py --rows 200000 --strategies uuid7
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _configure():
+    if not os.environ.get("DATABASE_URL"):
+        path = os.path.join(tempfile.mkdtemp(prefix="hng-ids-"), "ids.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ.setdefault("DB_STARTUP_CHECK", "false")
+
+
+def _index_size(conn, table):
+    from sqlalchemy import text
+
+    if conn.dialect.name == "postgresql":
+        return conn.execute(text(f"SELECT pg_relation_size('{table.name}_pkey')")).scalar()
+    # A non-integer primary key gets its own automatic index in SQLite.
+    return conn.execute(
+        text("SELECT SUM(pgsize) FROM dbstat WHERE name = :name"),
+        {"name": f"sqlite_autoindex_{table.name}_1"},
+    ).scalar()
+
+
+def run_strategy(engine, name, generate, rows, batch_size):
+    from sqlalchemy import Column, MetaData, String, Table
+
+    from app.models import UUIDKey
+
+    table = Table(f"id_bench_{name}", MetaData(), Column("id", UUIDKey, primary_key=True), Column("payload", String))
+    table.drop(engine, checkfirst=True)
+    table.create(engine)
+    segment = max(rows // 10, batch_size)
+    rates = []
+    try:
+        inserted, mark = 0, 0
+        start = started = time.perf_counter()
+        while inserted < rows:
+            count = min(batch_size, rows - inserted)
+            with engine.begin() as conn:
+                conn.execute(table.insert(), [{"id": str(generate()), "payload": "x" * 32} for _ in range(count)])
+            inserted += count
+            if inserted - mark >= segment or inserted == rows:
+                now = time.perf_counter()
+                rates.append((inserted - mark) / (now - started))
+                mark, started = inserted, now
+        overall = rows / (time.perf_counter() - start)
+        with engine.connect() as conn:
+            size = _index_size(conn, table)
+    finally:
+        if engine.dialect.name == "postgresql":
+            table.drop(engine)
+    return rates, overall, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--strategies", nargs="+", default=["uuid4", "uuid7"])
+    args = parser.parse_args()
+    _configure()
+
+    from app.crud import ID_GENERATORS
+    from app.db import get_engine
+
+    engine = get_engine()
+    print(f"{engine.dialect.name}, {args.rows} rows in batches of {args.batch_size}")
+    print(f"{'strategy':<10}{'first 10% rows/s':>18}{'last 10% rows/s':>18}{'overall rows/s':>16}{'pk index MB':>13}")
+    for name in args.strategies:
+        rates, overall, size = run_strategy(engine, name, ID_GENERATORS[name], args.rows, args.batch_size)
+        print(f"{name:<10}{rates[0]:>18.0f}{rates[-1]:>18.0f}{overall:>16.0f}{(size or 0) / 2**20:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
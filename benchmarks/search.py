@@ -0,0 +1,150 @@
+"""Organisation name prefix search at scale.
+
+Seeds ``--orgs`` organisations (default 1M) with random two-word names into
+a throwaway SQLite database, or DATABASE_URL migrated with Alembic. One
+user belongs to every organisation and another to ``--memberships`` of
+them (default 10). Then it times ``crud.search_organisations`` as each
+user for short and long prefixes, both first pages and pages reached
+through the keyset cursor, and prints the database's plan for the query.
+``--no-index`` drops ix_users_organisation_user_name first, for
+comparison.
+
+    python benchmarks/search.py
+    python benchmarks/search.py --orgs 200000 --memberships 3 --no-index
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import string
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _configure():
+    if not os.environ.get("DATABASE_URL"):
+        path = os.path.join(tempfile.mkdtemp(prefix="hng-search-"), "search.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ.setdefault("DB_STARTUP_CHECK", "false")
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=ROOT, check=True, capture_output=True)
+
+
+def _word(rng):
+    return "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))).capitalize()
+
+
+def _seed(orgs, memberships, batch_size=10000):
+    from sqlalchemy import insert
+
+    from app import models
+    from app.db import get_engine
+
+    rng = random.Random(42)
+    creator, member = str(uuid.uuid4()), str(uuid.uuid4())
+    joined = set(rng.sample(range(orgs), min(memberships, orgs)))
+    with get_engine().begin() as conn:
+        conn.execute(insert(models.User), [{
+            "userId": userId, "firstName": "Bench", "lastName": lastName,
+            "email": f"{userId}@example.com", "hashed_password": "x",
+        } for userId, lastName in ((creator, "Creator"), (member, "Member"))])
+        for start in range(0, orgs, batch_size):
+            batch = [
+                {"orgId": str(uuid.uuid4()), "name": f"{_word(rng)} {_word(rng)}", "creator_id": creator}
+                for _ in range(min(batch_size, orgs - start))
+            ]
+            conn.execute(insert(models.Organisation), batch)
+            # The names are ASCII, so Python's lower() matches the database's.
+            rows = [
+                {"id": str(uuid.uuid4()), "userId": creator, "orgId": org["orgId"], "name_key": org["name"].lower()}
+                for org in batch
+            ]
+            rows += [
+                {"id": str(uuid.uuid4()), "userId": member, "orgId": org["orgId"], "name_key": org["name"].lower()}
+                for i, org in enumerate(batch, start=start) if i in joined
+            ]
+            conn.execute(insert(models.User_organisation), rows)
+    return {"every org": creator, f"{len(joined)} orgs": member}
+
+
+def _plan(conn, userId, q):
+    from sqlalchemy import bindparam, text
+
+    from app.models import UUIDKey
+
+    key = 'm.name_key COLLATE "C"' if conn.dialect.name == "postgresql" else "m.name_key"
+    explain = "EXPLAIN" if conn.dialect.name == "postgresql" else "EXPLAIN QUERY PLAN"
+    sql = (
+        f'{explain} SELECT o."orgId" FROM users_organisation m JOIN organisations o ON o."orgId" = m."orgId" '
+        f'WHERE m."userId" = :user AND {key} >= :lo AND {key} < :hi ORDER BY {key}, m."orgId" LIMIT 21'
+    )
+    stmt = text(sql).bindparams(bindparam("user", type_=UUIDKey()))
+    rows = conn.execute(stmt, {"user": userId, "lo": q, "hi": q[:-1] + chr(ord(q[-1]) + 1)}).all()
+    return "\n".join("    " + str(row[-1]) for row in rows)
+
+
+async def _time(userId, q, pages, repeat, limit):
+    from app import crud
+    from app.db import get_async_sessionmaker
+
+    first, later = [], []
+    async with get_async_sessionmaker()() as db:
+        for _ in range(repeat):
+            cursor = None
+            for page in range(pages):
+                start = time.perf_counter()
+                organisations, name_keys = await crud.search_organisations(db, userId, q, limit=limit + 1, cursor=cursor)
+                (first if page == 0 else later).append((time.perf_counter() - start) * 1000)
+                if len(organisations) <= limit:
+                    break
+                cursor = (name_keys[limit - 1], organisations[limit - 1]["orgId"])
+    return first, later
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orgs", type=int, default=1_000_000)
+    parser.add_argument("--memberships", type=int, default=10, help="organisations the second user belongs to")
+    parser.add_argument("--repeat", type=int, default=50, help="runs per prefix")
+    parser.add_argument("--pages", type=int, default=5, help="cursor pages followed per run")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--no-index", action="store_true", help="drop ix_users_organisation_user_name first")
+    args = parser.parse_args()
+    _configure()
+
+    from sqlalchemy import text
+
+    from app.db import get_engine
+
+    start = time.perf_counter()
+    users = _seed(args.orgs, args.memberships)
+    print(f"seeded {args.orgs} organisations in {time.perf_counter() - start:.1f}s")
+    with get_engine().begin() as conn:
+        if args.no_index:
+            conn.execute(text("DROP INDEX ix_users_organisation_user_name"))
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("ANALYZE organisations"))
+            conn.execute(text("ANALYZE users_organisation"))
+        else:
+            conn.execute(text("ANALYZE"))
+        for label, userId in users.items():
+            print(f"plan for q='ab', user in {label}:\n{_plan(conn, userId, 'ab')}\n")
+
+    print(f"{'user in':<12}{'prefix':<10}{'first p50 ms':>14}{'first p95 ms':>14}{'next p50 ms':>13}{'next p95 ms':>13}")
+    for label, userId in users.items():
+        for q in ("a", "ab", "abc", "abcd"):
+            first, later = asyncio.run(_time(userId, q, args.pages, args.repeat, args.limit))
+            later_p50 = f"{statistics.median(later):>13.2f}" if later else f"{'-':>13}"
+            later_p95 = f"{statistics.quantiles(later, n=20)[-1]:>13.2f}" if len(later) > 1 else f"{'-':>13}"
+            print(f"{label:<12}{q:<10}{statistics.median(first):>14.2f}{statistics.quantiles(first, n=20)[-1]:>14.2f}{later_p50}{later_p95}")
+
+
+if __name__ == "__main__":
+    main()
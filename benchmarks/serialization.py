@@ -0,0 +1,71 @@
+"""Per-response serialization cost: before (FastAPI default) and after (orjson).
+
+"before" is what the handlers used to do: return a dict that FastAPI runs
+through jsonable_encoder and renders with the stdlib-json JSONResponse (or
+build a JSONResponse directly). "after" is the ORJSONResponse the handlers
+return now. Only body rendering is timed; no ASGI or database work.
+
+    python benchmarks/serialization.py --orgs 100 --number 20000
+"""
+import argparse
+import timeit
+import uuid
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+
+def _payloads(orgs):
+    user = {
+        "userId": str(uuid.uuid4()),
+        "firstName": "John",
+        "lastName": "Doe",
+        "email": "john.doe@example.com",
+        "phone": "1234567890",
+    }
+    return {
+        "login": {
+            "status": "success",
+            "message": "Login successful",
+            "data": {"accessToken": "x" * 180, "user": user},
+        },
+        f"organisations x{orgs}": {
+            "status": "success",
+            "message": "Organisations retrieved successfully",
+            "data": {
+                "organisations": [
+                    {"orgId": str(uuid.uuid4()), "name": f"Organisation {i}", "description": "Default organisation"}
+                    for i in range(orgs)
+                ],
+                "nextCursor": None,
+            },
+        },
+        "error": {"status": "Bad request", "message": "Authentication failed", "statusCode": 401},
+    }
+
+
+STRATEGIES = {
+    "dict + jsonable_encoder + JSONResponse": lambda content: JSONResponse(jsonable_encoder(content)),
+    "JSONResponse": JSONResponse,
+    "ORJSONResponse": ORJSONResponse,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orgs", type=int, default=100, help="organisations in the list payload")
+    parser.add_argument("--number", type=int, default=20000, help="responses rendered per measurement")
+    args = parser.parse_args()
+
+    print(f"{'payload':<22}{'strategy':<42}{'us/response':>12}{'speedup':>9}")
+    for name, content in _payloads(args.orgs).items():
+        baseline = None
+        for strategy, render in STRATEGIES.items():
+            seconds = min(timeit.repeat(lambda: render(content), number=args.number, repeat=3))
+            per_response = seconds / args.number * 1e6
+            baseline = baseline or per_response
+            print(f"{name:<22}{strategy:<42}{per_response:>12.2f}{baseline / per_response:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,70 @@
-from typing import Optional
-from fastapi import FastAPI, Depends, HTTPException, Request, status
+from typing import List, Optional
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, status
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import HTTPBasic, HTTPBasicCredentials, HTTPBearer
-from fastapi.responses import JSONResponse
-from app import models, schemas, crud
-from app.db import SessionLocal, engine
-from app.auth import create_access_token, verify_password
+from fastapi.responses import ORJSONResponse, PlainTextResponse
+from app import auth, models, schemas, crud
+from app.db import get_async_engine, get_async_read_sessionmaker, get_async_sessionmaker, pool_stats
+from app.auth import create_access_token, verify_and_update_password_async
 from datetime import timedelta
 from app.config import settings
 from app.exceptions import http_exception_handler, NotFoundError, AuthError, RegistrationError
+from app.cache import organisation_cache, principal_cache, user_cache
+from app.responses import etag_response, export_response
+from app.revocation import denylist
+from app.migrations import check_schema
+from app import metrics, slow_queries
+from contextlib import asynccontextmanager
+import asyncio
 import secrets
+import time
 
+MAX_STATS_ORGS = 100
 
-models.Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Long-running deployments open the pool, verify the schema and spawn
+    # the bcrypt workers up front; serverless ones skip this, connect lazily
+    # on the first request and hash inline.
+    if settings.DB_POOL_PROFILE == "container":
+        if settings.DB_STARTUP_CHECK:
+            await check_schema(get_async_engine())
+        await asyncio.to_thread(auth.start_pool)
+    yield
+    auth.shutdown_pool()
+
+
+# Handlers build plain dicts and return ORJSONResponse themselves, skipping
+# FastAPI's jsonable_encoder pass; response_model only documents the shape.
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 app.add_exception_handler(HTTPException, http_exception_handler)
+app.add_middleware(metrics.MetricsMiddleware)
+slow_queries.install()
 
 # Declaration of the HTTP Basic Authentication method
 security = HTTPBearer()
 
 # Declaration of the Bearer schema for token-based authentication
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db(request: Request):
+    async with get_async_sessionmaker()() as db:
+        # Lets the session see the caller (``request.state.principal``) for
+        # read-your-writes routing.
+        db.info["state"] = request.state
+        yield db
+
+async def get_read_db(request: Request):
+    # Read-only endpoints: SELECTs go to a replica when DB_REPLICA_URLS is set.
+    async with get_async_read_sessionmaker()() as db:
+        db.info["state"] = request.state
         yield db
-    finally:
-        db.close()
         
 security = HTTPBearer()
 
-def get_current_user(request: Request, db: Session = Depends(get_db)):
+async def get_current_user(request: Request, db: AsyncSession = Depends(get_read_db)):
     auth_header: Optional[str] = request.headers.get('Authorization')
     if auth_header is None:
         raise HTTPException(
@@ -58,34 +90,103 @@ def get_current_user(request: Request, db: Session = Depends(get_db)):
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user = db.query(models.User).filter(models.User.userId == userId).first()
+    if denylist.is_stale():
+        async with get_async_sessionmaker()() as sync_db:
+            await denylist.sync(sync_db)
+    if payload.get("jti") in denylist:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    request.state.token_payload = payload
+    request.state.principal = userId
+
+    user = principal_cache.get(userId)
+    if user is not None:
+        return user
+
+    user = await db.get(models.User, userId)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
+    # Detach the instance so later commits in this request don't expire it
+    # while it is shared with other requests through the cache.
+    db.expunge(user)
+    principal_cache.set(userId, user, ttl=payload.get("exp", 0) - time.time())
     return user
+def org_id(orgId: str):
+    # Path ids in any case or spelling name the same organisation.
+    canonical = models.canonical_id(orgId)
+    if canonical is None:
+        raise NotFoundError(
+            detail="Organisation not found",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return canonical
+
+async def _check_membership(db: AsyncSession, userId: str, orgId: str):
+    # Non-members get the same 404 as a missing organisation, so org ids
+    # can't be probed.
+    if not await crud.is_member(db, userId, orgId):
+        raise NotFoundError(
+            detail="Organisation not found",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+async def require_membership(orgId: str = Depends(org_id), current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    await _check_membership(db, current_user.userId, orgId)
+
+async def require_write_membership(orgId: str = Depends(org_id), current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    # For routes that write: checks on the primary session the handler
+    # also uses, rather than opening a read session as well.
+    await _check_membership(db, current_user.userId, orgId)
+
 @app.get("/")
-def greeting():
+async def greeting():
 	return {
 		"msg" : "hello"
 	}
 
-@app.post("/auth/register")
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(db, email=user.email)
-    if db_user:
+# Pool internals are for operators, not the public.
+@app.get("/health/db")
+async def database_health(current_user: models.User = Depends(get_current_user)):
+    return ORJSONResponse({
+        "status": "success",
+        "data": {"pool": pool_stats(get_async_engine().sync_engine)}
+    })
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics():
+    body = metrics.render(
+        metrics.pool_metrics(pool_stats(get_async_engine().sync_engine))
+        + metrics.cache_metrics("principal", principal_cache.stats())
+        + metrics.cache_metrics("user", user_cache.stats())
+        + metrics.cache_metrics("organisation", organisation_cache.stats())
+        + metrics.counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_MS.", slow_queries.slow_query_count)
+    )
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+@app.post("/auth/register", response_model=schemas.AuthResponse, status_code=status.HTTP_201_CREATED)
+async def register_user(user: schemas.UserCreate, request: Request, db: AsyncSession = Depends(get_db)):
+    # The unique email index rejects duplicates; no lookup beforehand.
+    try:
+        async with crud.unit_of_work(db):
+            db_user = await crud.create_user(db=db, user=user, commit=False)
+            request.state.principal = db_user.userId
+            default_org = schemas.OrganisationCreate(name=f"{db_user.firstName}'s Organisation", description="Default organisation")
+            db_orgs = await crud.create_organisation(db=db, organisation=default_org, userId=db_user.userId, commit=False)
+            db_user_org = schemas.UserOrgsCreate(userId=db_user.userId, orgId=db_orgs.orgId)
+            await crud.create_user_orgs(db=db, data=db_user_org, commit=False)
+            refresh_token = await crud.create_refresh_token(db=db, userId=db_user.userId, commit=False)
+    except IntegrityError:
         raise RegistrationError(
             detail="Registration unsuccessful",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    db_user = crud.create_user(db=db, user=user)
-    default_org = schemas.OrganisationCreate(name=f"{db_user.firstName}'s Organisation", description="Default organisation")
-    db_orgs = crud.create_organisation(db=db, organisation=default_org, userId=db_user.userId)
-    db_user_org = schemas.UserOrgsCreate(userId=db_user.userId, orgId=db_orgs.orgId)
-    crud.create_user_orgs(db=db, data=db_user_org)
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": db_user.userId}, expires_delta=access_token_expires
@@ -95,6 +196,7 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
             "message": "Registration successful",  
             "data": {
                 "accessToken": access_token, 
+                "refreshToken": refresh_token,
                 "user": {
                     "userId": db_user.userId,
                     "firstName": db_user.firstName,
@@ -104,25 +206,36 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
                 }
             }
         }
-    return JSONResponse(content, status_code=status.HTTP_201_CREATED)
+    return ORJSONResponse(content, status_code=status.HTTP_201_CREATED)
 
-@app.post("/auth/login")
-def login_for_access_token(data: schemas.UserLogin, db: Session = Depends(get_db)):
-    user = crud.get_user_by_email(db, email=data.email)
-    if not user or not verify_password(data.password, user.hashed_password):
+@app.post("/auth/login", response_model=schemas.AuthResponse)
+async def login_for_access_token(data: schemas.UserLogin, db: AsyncSession = Depends(get_db)):
+    user = await crud.get_user_by_email(db, email=data.email)
+    if not user:
+        raise AuthError(
+            detail="Authentication failed",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    valid, new_hash = await verify_and_update_password_async(data.password, user.hashed_password)
+    if not valid:
         raise AuthError(
             detail="Authentication failed",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        user.hashed_password = new_hash
+    # Commits the rehash, if any, together with the new refresh token.
+    refresh_token = await crud.create_refresh_token(db=db, userId=user.userId)
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.userId}, expires_delta=access_token_expires
     )
-    return JSONResponse({ 
+    return ORJSONResponse({ 
             "status": "success",  
             "message": "Login successful",  
             "data": {
                 "accessToken": access_token, 
+                "refreshToken": refresh_token,
                 "user": {
                     "userId": user.userId,
                     "firstName": user.firstName,
@@ -134,54 +247,96 @@ def login_for_access_token(data: schemas.UserLogin, db: Session = Depends(get_db
         }
     )
     
-@app.get("/api/users/{userId}")
-def get_user(userId: str, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.userId == userId, models.User.userId == current_user.userId ).first()
+@app.post("/auth/refresh", response_model=schemas.TokenResponse)
+async def refresh_access_token(data: schemas.RefreshRequest, db: AsyncSession = Depends(get_db)):
+    rotated = await crud.rotate_refresh_token(db, data.refreshToken)
+    if rotated is None:
+        raise AuthError(
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    userId, refresh_token = rotated
+    access_token = create_access_token(
+        data={"sub": userId}, expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return ORJSONResponse({
+        "status": "success",
+        "message": "Token refreshed",
+        "data": {
+            "accessToken": access_token,
+            "refreshToken": refresh_token,
+        }
+    })
+
+@app.post("/auth/logout", response_model=schemas.SuccessResponse)
+async def logout(request: Request, data: Optional[schemas.LogoutRequest] = None, current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    payload = request.state.token_payload
+    if payload.get("jti") is not None:
+        await denylist.revoke(db, payload["jti"], payload["exp"], commit=False)
+    if data is not None and data.refreshToken:
+        await crud.revoke_refresh_token(db, data.refreshToken, commit=False)
+    await db.commit()
+    return ORJSONResponse({
+        "status": "success",
+        "message": "Logout successful"
+    })
+
+@app.get("/api/users/{userId}", response_model=schemas.UserDataResponse)
+async def get_user(userId: str, request: Request, current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    user = await crud.get_user(db, current_user.userId) if models.canonical_id(userId) == current_user.userId else None
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     content = {
 		"status": "success",
         "message": "User data fetched successful",
-        "data": {
-            "userId": user.userId,
-            "firstName": user.firstName,
-            "lastName": user.lastName,
-            "email":  user.email,
-            "phone":  user.phone,
-        }
+        "data": user
     }
-    return JSONResponse(content, status_code=status.HTTP_200_OK)
-
-@app.get("/api/organisations")
-def get_user(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    organisations = db.query(models.User_organisation).filter(models.User_organisation.userId == current_user.userId).all()
-    orgData = []
-    for org in organisations:
-        orgs = db.query(models.Organisation).filter(models.Organisation.orgId == org.orgId).first()
-        orgData.append({
-            'orgId': orgs.orgId,
-            'name': orgs.name,
-            'description': orgs.description
-        })
-    print(orgData)
-    return {
+    return etag_response(request, content, status_code=status.HTTP_200_OK)
+
+@app.get("/api/organisations", response_model=schemas.OrganisationListResponse)
+async def get_user(limit: int = Query(50, ge=1, le=100), cursor: Optional[str] = None, current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    if cursor is not None:
+        # The cursor is an orgId; a malformed one would bind as the nil UUID
+        # and silently restart from the first page.
+        cursor = models.canonical_id(cursor)
+        if cursor is None:
+            raise RegistrationError(detail="Invalid cursor")
+    organisations = await crud.get_user_organisations(db, userId=current_user.userId, limit=limit + 1, cursor=cursor)
+    next_cursor = None
+    if len(organisations) > limit:
+        organisations = organisations[:limit]
+        next_cursor = organisations[-1].orgId
+    orgData = [
+        {
+            'orgId': org.orgId,
+            'name': org.name,
+            'description': org.description
+        }
+        for org in organisations
+    ]
+    return ORJSONResponse({
         "status": "success",
         "message": "Organisations retrieved successfully",
-        "data": {"organisations": orgData}
-    }
+        "data": {"organisations": orgData, "nextCursor": next_cursor}
+    })
 
-@app.post("/api/organisations", status_code=status.HTTP_201_CREATED)
-def create_organisation(organisation: schemas.OrganisationCreate, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    db_data = db.query(models.Organisation).filter(models.Organisation.name == organisation.name).first()
-    if db_data is not None:
+@app.post("/api/organisations", response_model=schemas.OrganisationDataResponse, status_code=status.HTTP_201_CREATED)
+async def create_organisation(organisation: schemas.OrganisationCreate, current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    try:
+        async with crud.unit_of_work(db):
+            db_org = await crud.create_organisation(db=db, organisation=organisation, userId=current_user.userId, commit=False, unique_name=True)
+            if db_org is not None:
+                db_user_org = schemas.UserOrgsCreate(userId=db_org.creator_id, orgId=db_org.orgId)
+                await crud.create_user_orgs(db=db, data=db_user_org, commit=False)
+    except IntegrityError:
+        # A concurrent create of the same name committed first.
+        db_org = None
+    if db_org is None:
         raise RegistrationError(
             detail="Client error",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    db_org = crud.create_organisation(db=db, organisation=organisation, userId=current_user.userId)
-    db_user_org = schemas.UserOrgsCreate(userId=db_org.creator_id, orgId=db_org.orgId)
-    crud.create_user_orgs(db=db, data=db_user_org)
-    return {
+    return ORJSONResponse({
             "status": "success",
             "message": "Organisation created successfully",
             "data": {
@@ -189,40 +344,137 @@ def create_organisation(organisation: schemas.OrganisationCreate, current_user:
                 "name": db_org.name, 
                 "description": db_org.description
             }
+        }, status_code=status.HTTP_201_CREATED)
+
+# Declared before /api/organisations/{orgId} so "search" is not taken as an id.
+@app.get("/api/organisations/search", response_model=schemas.OrganisationListResponse)
+async def search_organisations(q: str = Query(..., min_length=1, max_length=100), limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None, current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    after = None
+    if cursor is not None:
+        after = crud.decode_search_cursor(cursor)
+        if after is None:
+            raise RegistrationError(detail="Invalid cursor")
+    # Only organisations the caller belongs to are searched.
+    organisations, name_keys = await crud.search_organisations(db, current_user.userId, q, limit=limit + 1, cursor=after)
+    next_cursor = None
+    if len(organisations) > limit:
+        organisations = organisations[:limit]
+        next_cursor = crud.encode_search_cursor(name_keys[limit - 1], organisations[-1]["orgId"])
+    return ORJSONResponse({
+        "status": "success",
+        "message": "Organisations retrieved successfully",
+        "data": {"organisations": organisations, "nextCursor": next_cursor}
+    })
+
+# Declared before /api/organisations/{orgId} so "stats" is not taken as an id.
+@app.get("/api/organisations/stats", response_model=schemas.OrganisationStatsResponse)
+async def get_organisation_stats(orgIds: List[str] = Query(...), current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    # Accepts ?orgIds=a&orgIds=b as well as ?orgIds=a,b
+    ids = list(dict.fromkeys(models.canonical_id(orgId) for value in orgIds for orgId in value.split(",") if orgId))
+    if not ids or len(ids) > MAX_STATS_ORGS:
+        raise RegistrationError(detail=f"Between 1 and {MAX_STATS_ORGS} orgIds are required")
+    if None in ids:
+        raise RegistrationError(detail="orgIds must be UUIDs")
+    # Only organisations the caller belongs to are reported.
+    orgIds = await crud.get_memberships(db, current_user.userId)
+    if not orgIds.issuperset(ids):
+        orgIds = await crud.get_memberships(db, current_user.userId, refresh=True)
+    counts = await crud.get_member_counts(db, [orgId for orgId in ids if orgId in orgIds])
+    return ORJSONResponse({
+        "status": "success",
+        "message": "Organisation stats retrieved successfully",
+        "data": {
+            "organisations": [{"orgId": orgId, "memberCount": counts[orgId]} for orgId in ids if orgId in counts]
         }
+    })
 
-@app.get("/api/organisations/{orgId}")
-def get_organisation(orgId: str, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    organisation = db.query(models.Organisation).filter(models.Organisation.orgId == orgId).first()
+@app.get("/api/organisations/{orgId}", response_model=schemas.OrganisationDataResponse, dependencies=[Depends(require_membership)])
+async def get_organisation(request: Request, orgId: str = Depends(org_id), current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    organisation = await crud.get_organisation(db, orgId)
     if organisation is None:
         raise HTTPException(status_code=404, detail="Organisation not found")
-    return {
+    return etag_response(request, {
             "status": "success",
             "message": "Organisation created successfully",
-            "data": {
-                "orgId": organisation.orgId, 
-                "name": organisation.name, 
-                "description": organisation.description
-            }
-        }
+            "data": organisation
+        })
 
-@app.post("/api/organisations/{orgId}/users")
-def add_user_to_organisation(orgId: str, user: schemas.UserOrgs, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    db_org = db.query(models.Organisation).filter(models.Organisation.orgId == orgId).first()
-    if db_org is None:
+@app.get("/api/organisations/{orgId}/users", response_model=schemas.MemberListResponse, dependencies=[Depends(require_membership)])
+async def get_organisation_members(orgId: str = Depends(org_id), limit: int = Query(50, ge=1, le=100), cursor: Optional[str] = None, current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    if cursor is not None:
+        # The cursor is a userId, validated as in GET /api/organisations.
+        cursor = models.canonical_id(cursor)
+        if cursor is None:
+            raise RegistrationError(detail="Invalid cursor")
+    members = await crud.get_organisation_members(db, orgId, limit=limit + 1, cursor=cursor)
+    next_cursor = None
+    if len(members) > limit:
+        members = members[:limit]
+        next_cursor = members[-1]["userId"]
+    return ORJSONResponse({
+        "status": "success",
+        "message": "Members retrieved successfully",
+        "data": {"users": members, "nextCursor": next_cursor}
+    })
+
+@app.get("/api/organisations/{orgId}/users/export", dependencies=[Depends(require_membership)])
+async def export_organisation_members(request: Request, orgId: str = Depends(org_id), format: str = Query("ndjson", pattern="^(ndjson|csv)$"), current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    async def batches():
+        # The request's session is closed once the handler returns, before
+        # the body is sent, so the stream holds its own for as long as it runs.
+        async with get_async_read_sessionmaker()() as stream_db:
+            stream_db.info["state"] = request.state
+            async for rows in crud.stream_organisation_members(stream_db, orgId):
+                yield rows
+
+    fields = [column.key for column in crud.MEMBER_COLUMNS]
+    return export_response(batches(), format, fields, filename=f"organisation-{orgId}-members")
+
+@app.post("/api/organisations/{orgId}/users", response_model=schemas.SuccessResponse, dependencies=[Depends(require_write_membership)])
+async def add_user_to_organisation(user: schemas.UserOrgs, orgId: str = Depends(org_id), current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    db_user_org = schemas.UserOrgsCreate(userId=user.userId, orgId=orgId)
+    try:
+        async with crud.unit_of_work(db):
+            added = await crud.create_user_orgs_if_absent(db=db, data=db_user_org)
+    except IntegrityError:
+        # Foreign key violation: work out which side is missing. This only
+        # runs on the error path.
+        if await db.get(models.Organisation, orgId) is None:
+            raise NotFoundError(
+                detail="Organisation not found",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
         raise NotFoundError(
-            detail="Organisation not found",
+            detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    db_user_org = schemas.UserOrgsCreate(userId=user.userId, orgId=db_org.orgId)
-    organisations = db.query(models.User_organisation).filter(models.User_organisation.userId == user.userId, models.User_organisation.orgId == orgId).first()
-    if user.userId == db_org.creator_id or organisations is not None:
+    # The creator's membership is inserted with the organisation, so this
+    # also covers adding the creator again.
+    if not added:
         raise AuthError(
             detail="User already belongs to organisation",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    crud.create_user_orgs(db=db, data=db_user_org)
-    return {
+    return ORJSONResponse({
         "status": "success",
         "message": "User added to organisation successfully"
-    }
+    })
+
+
+@app.post("/api/organisations/{orgId}/users/bulk", response_model=schemas.BulkMembershipResponse, dependencies=[Depends(require_write_membership)])
+async def add_users_to_organisation(body: schemas.UserOrgsBulk, orgId: str = Depends(org_id), current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    async with crud.unit_of_work(db):
+        results = await crud.create_user_orgs_bulk(db=db, orgId=orgId, userIds=body.userIds, commit=False)
+    if results is None:
+        raise NotFoundError(
+            detail="Organisation not found",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return ORJSONResponse({
+        "status": "success",
+        "message": "Bulk membership processed",
+        "data": {
+            "added": sum(1 for _, status in results if status == "added"),
+            "results": [{"userId": userId, "status": status} for userId, status in results],
+        },
+    })
@@ -0,0 +1,57 @@
+"""Initial schema, as previously created by ``metadata.create_all``.
+
+Databases that were bootstrapped by ``create_all`` before migrations
+existed already have these tables; they are left untouched so the
+revision can simply be recorded.
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-07-20
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("userId", sa.String(), primary_key=True),
+            sa.Column("firstName", sa.String(), nullable=False),
+            sa.Column("lastName", sa.String(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("hashed_password", sa.String(), nullable=False),
+            sa.Column("phone", sa.String()),
+        )
+        op.create_index("ix_users_userId", "users", ["userId"], unique=True)
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+    if "organisations" not in existing:
+        op.create_table(
+            "organisations",
+            sa.Column("orgId", sa.String(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("description", sa.String()),
+            sa.Column("creator_id", sa.String(), sa.ForeignKey("users.userId")),
+        )
+        op.create_index("ix_organisations_orgId", "organisations", ["orgId"], unique=True)
+    if "users_organisation" not in existing:
+        op.create_table(
+            "users_organisation",
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column("userId", sa.String(), sa.ForeignKey("users.userId")),
+            sa.Column("orgId", sa.String(), sa.ForeignKey("organisations.orgId")),
+        )
+        op.create_index("ix_users_organisation_id", "users_organisation", ["id"], unique=True)
+
+
+def downgrade():
+    op.drop_table("users_organisation")
+    op.drop_table("organisations")
+    op.drop_table("users")
@@ -0,0 +1,47 @@
+"""Indexes for membership, organisation-name and email lookups.
+
+- unique (userId, orgId) on memberships, after removing duplicate rows;
+- (orgId, userId) on memberships for member listings;
+- organisations.name for the duplicate-name check;
+- unique lower(email) for case-insensitive login and registration;
+- drops the single-column indexes that duplicated the primary keys.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2024-07-20
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        'DELETE FROM users_organisation WHERE id NOT IN '
+        '(SELECT MIN(id) FROM users_organisation GROUP BY "userId", "orgId")'
+    )
+    # IF [NOT] EXISTS: databases bootstrapped by create_all may already match.
+    op.create_index("uq_users_organisation_user_org", "users_organisation", ["userId", "orgId"], unique=True, if_not_exists=True)
+    op.create_index("ix_users_organisation_org_user", "users_organisation", ["orgId", "userId"], if_not_exists=True)
+    op.drop_index("ix_users_organisation_id", table_name="users_organisation", if_exists=True)
+
+    op.create_index("ix_organisations_name", "organisations", ["name"], if_not_exists=True)
+    op.drop_index("ix_organisations_orgId", table_name="organisations", if_exists=True)
+
+    op.create_index("uq_users_email_lower", "users", [sa.text("lower(email)")], unique=True, if_not_exists=True)
+    op.drop_index("ix_users_userId", table_name="users", if_exists=True)
+
+
+def downgrade():
+    op.create_index("ix_users_userId", "users", ["userId"], unique=True)
+    op.drop_index("uq_users_email_lower", table_name="users")
+    op.create_index("ix_organisations_orgId", "organisations", ["orgId"], unique=True)
+    op.drop_index("ix_organisations_name", table_name="organisations")
+    op.create_index("ix_users_organisation_id", "users_organisation", ["id"], unique=True)
+    op.drop_index("ix_users_organisation_org_user", table_name="users_organisation")
+    op.drop_index("uq_users_organisation_user_org", table_name="users_organisation")
@@ -0,0 +1,31 @@
+"""Refresh tokens.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-07-22
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "refresh_tokens",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("family_id", sa.String(), nullable=False),
+        sa.Column("userId", sa.String(), sa.ForeignKey("users.userId"), nullable=False),
+        sa.Column("token_hash", sa.LargeBinary(32), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.Column("used_at", sa.DateTime()),
+    )
+    op.create_index("ix_refresh_tokens_family_id", "refresh_tokens", ["family_id"])
+
+
+def downgrade():
+    op.drop_table("refresh_tokens")
@@ -0,0 +1,29 @@
+"""Denormalized member counts on organisations.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-07-23
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "organisations",
+        sa.Column("member_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.execute(
+        'UPDATE organisations SET member_count = '
+        '(SELECT COUNT(*) FROM users_organisation WHERE users_organisation."orgId" = organisations."orgId")'
+    )
+
+
+def downgrade():
+    op.drop_column("organisations", "member_count")
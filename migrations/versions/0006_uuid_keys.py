@@ -0,0 +1,121 @@
+"""Store user, organisation and membership keys as UUIDs.
+
+PostgreSQL converts the columns in place to native ``uuid``, dropping and
+recreating the foreign keys around the change. Other databases cannot
+alter column types in place, so each table is rebuilt with ``BINARY(16)``
+keys and its rows are copied across in batches, being converted as they go.
+Every key must already be a UUID string, as ``crud`` has always generated.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2024-07-24
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.models import UUIDKey
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+# Parent tables first.
+KEY_COLUMNS = {
+    "users": ["userId"],
+    "organisations": ["orgId", "creator_id"],
+    "users_organisation": ["id", "userId", "orgId"],
+    "refresh_tokens": ["userId"],
+}
+COPY_BATCH_SIZE = 5000
+
+
+def _tables(metadata, key_type, suffix=""):
+    sa.Table(
+        f"users{suffix}", metadata,
+        sa.Column("userId", key_type, primary_key=True),
+        sa.Column("firstName", sa.String(), nullable=False),
+        sa.Column("lastName", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("phone", sa.String()),
+    )
+    sa.Table(
+        f"organisations{suffix}", metadata,
+        sa.Column("orgId", key_type, primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("description", sa.String()),
+        sa.Column("creator_id", key_type, sa.ForeignKey(f"users{suffix}.userId")),
+        sa.Column("member_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    sa.Table(
+        f"users_organisation{suffix}", metadata,
+        sa.Column("id", key_type, primary_key=True),
+        sa.Column("userId", key_type, sa.ForeignKey(f"users{suffix}.userId")),
+        sa.Column("orgId", key_type, sa.ForeignKey(f"organisations{suffix}.orgId")),
+    )
+    sa.Table(
+        f"refresh_tokens{suffix}", metadata,
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("family_id", sa.String(), nullable=False),
+        sa.Column("userId", key_type, sa.ForeignKey(f"users{suffix}.userId"), nullable=False),
+        sa.Column("token_hash", sa.LargeBinary(32), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.Column("used_at", sa.DateTime()),
+    )
+    return metadata
+
+
+def _create_indexes():
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.create_index("uq_users_email_lower", "users", [sa.text("lower(email)")], unique=True)
+    op.create_index("ix_organisations_name", "organisations", ["name"])
+    op.create_index("uq_users_organisation_user_org", "users_organisation", ["userId", "orgId"], unique=True)
+    op.create_index("ix_users_organisation_org_user", "users_organisation", ["orgId", "userId"])
+    op.create_index("ix_refresh_tokens_family_id", "refresh_tokens", ["family_id"])
+
+
+def _rebuild(old_key_type, new_key_type):
+    bind = op.get_bind()
+    old = _tables(sa.MetaData(), old_key_type)
+    new = _tables(sa.MetaData(), new_key_type, suffix="_new")
+    new.create_all(bind)
+    for name in KEY_COLUMNS:
+        result = bind.execute(sa.select(old.tables[name]).execution_options(yield_per=COPY_BATCH_SIZE))
+        for rows in result.mappings().partitions():
+            bind.execute(new.tables[f"{name}_new"].insert(), [dict(row) for row in rows])
+    for name in reversed(list(KEY_COLUMNS)):
+        op.drop_table(name)
+    for name in KEY_COLUMNS:
+        op.rename_table(f"{name}_new", name)
+    _create_indexes()
+
+
+def _alter_postgresql(type_, cast):
+    inspector = sa.inspect(op.get_bind())
+    foreign_keys = {name: inspector.get_foreign_keys(name) for name in KEY_COLUMNS}
+    for name, keys in foreign_keys.items():
+        for fk in keys:
+            op.drop_constraint(fk["name"], name, type_="foreignkey")
+    for name, columns in KEY_COLUMNS.items():
+        for column in columns:
+            op.alter_column(name, column, type_=type_, postgresql_using=f'"{column}"::{cast}')
+    for name, keys in foreign_keys.items():
+        for fk in keys:
+            op.create_foreign_key(fk["name"], name, fk["referred_table"], fk["constrained_columns"], fk["referred_columns"])
+
+
+def upgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        _alter_postgresql(postgresql.UUID(as_uuid=True), "uuid")
+    else:
+        _rebuild(sa.String(), UUIDKey())
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        _alter_postgresql(sa.String(), "text")
+    else:
+        _rebuild(UUIDKey(), sa.String())
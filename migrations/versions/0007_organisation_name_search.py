@@ -0,0 +1,30 @@
+"""Index for case-insensitive organisation name prefix search.
+
+PostgreSQL builds the expression with COLLATE "C" so that range scans on
+it compare bytes, matching the queries in ``crud.search_organisations``.
+SQLite's default collation already does.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2024-07-25
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        key = sa.text('lower(name) COLLATE "C"')
+    else:
+        key = sa.text("lower(name)")
+    op.create_index("ix_organisations_name_lower", "organisations", [key, "orgId"])
+
+
+def downgrade():
+    op.drop_index("ix_organisations_name_lower", table_name="organisations")
@@ -0,0 +1,29 @@
+"""Unique names for organisations created through the API.
+
+``unique_name`` is only set by ``crud.create_organisation(unique_name=True)``
+and stays NULL on default organisations, which may share names. Existing
+rows are left NULL: the conditional INSERT already checks them, and the
+index only has to settle two creates racing each other.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2024-07-26
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("organisations", sa.Column("unique_name", sa.String()))
+    op.create_index("uq_organisations_unique_name", "organisations", ["unique_name"], unique=True)
+
+
+def downgrade():
+    op.drop_index("uq_organisations_unique_name", table_name="organisations")
+    op.drop_column("organisations", "unique_name")
@@ -0,0 +1,44 @@
+"""Per-member index for organisation name prefix search.
+
+Copies lower(name) of each membership's organisation into
+``users_organisation.name_key`` and indexes (userId, name_key, orgId), so
+a search reads only the caller's memberships. PostgreSQL builds the key
+column with COLLATE "C", as 0007 did for the expression it replaces.
+ix_organisations_name_lower is no longer used and is dropped.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2024-07-27
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("users_organisation", sa.Column("name_key", sa.String()))
+    op.execute(
+        'UPDATE users_organisation SET name_key = '
+        '(SELECT lower(name) FROM organisations WHERE organisations."orgId" = users_organisation."orgId")'
+    )
+    if op.get_bind().dialect.name == "postgresql":
+        key = sa.text('name_key COLLATE "C"')
+    else:
+        key = sa.text("name_key")
+    op.create_index("ix_users_organisation_user_name", "users_organisation", ["userId", key, "orgId"])
+    op.drop_index("ix_organisations_name_lower", table_name="organisations")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        key = sa.text('lower(name) COLLATE "C"')
+    else:
+        key = sa.text("lower(name)")
+    op.create_index("ix_organisations_name_lower", "organisations", [key, "orgId"])
+    op.drop_index("ix_users_organisation_user_name", table_name="users_organisation")
+    op.drop_column("users_organisation", "name_key")
@@ -0,0 +1,25 @@
+"""Drop the case-sensitive unique index on users.email.
+
+uq_users_email_lower (0002) already rejects any two emails that
+ix_users_email would, so every registration was maintaining two unique
+indexes for one rule. Lookups go through lower(email) as well.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2024-07-28
+"""
+from alembic import op
+
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_index("ix_users_email", table_name="users", if_exists=True)
+
+
+def downgrade():
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
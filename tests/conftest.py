@@ -0,0 +1,39 @@
+import os
+import tempfile
+
+import pytest
+
+# Without a configured Postgres instance, run the suite against a throwaway
+# SQLite database so it works on a bare checkout.
+LOCAL_DB = not os.path.exists(".env") and not (
+    os.environ.get("DATABASE_URL") or os.environ.get("DB_HOST")
+)
+if LOCAL_DB:
+    _db_path = os.path.join(tempfile.mkdtemp(prefix="hng-test-"), "test.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{_db_path}"
+    os.environ.setdefault("SECRET_KEY", "test-secret")
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    os.environ.setdefault("BCRYPT_WORKERS", "0")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def seed_accounts():
+    # Build the schema through the migrations, then create the account the
+    # auth specs log in as.
+    if LOCAL_DB:
+        from alembic import command
+        from alembic.config import Config
+        from fastapi.testclient import TestClient
+        from main import app
+
+        config = Config("alembic.ini")
+        config.attributes["configure_logger"] = False
+        command.upgrade(config, "head")
+        TestClient(app).post("/auth/register", json={
+            "firstName": "John",
+            "lastName": "Doe",
+            "email": "john.doe4@example.com",
+            "password": "password123",
+            "phone": "1234567890"
+        })
+    yield